@@ -0,0 +1,149 @@
+import asyncio
+import json
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.http import JsonResponse, HttpResponseNotAllowed
+
+from rest_framework import exceptions, status
+
+from authentication.serializers import RefreshTokenSerializer
+from my_gym.backends import TokenAuth
+from my_gym.models import UserModel
+from my_gym.utils import write_refresh_token_to_db
+
+# PBKDF2 releases the GIL, so a small pool hashes in parallel without
+# blocking the event loop.
+hashing_pool = ThreadPoolExecutor(max_workers=settings.LOGIN_HASHING_THREADS,
+                                  thread_name_prefix='login-hashing')
+
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _get_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(settings.LOGIN_MAX_CONCURRENCY)
+    return semaphore
+
+
+def _json_response(data, status_code):
+    return JsonResponse(data, status=status_code,
+                        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def _user_response(data, status_code=status.HTTP_201_CREATED):
+    # Same body as UserJSONRenderer renders for LoginView/RefreshTokenView.
+    return _json_response({'user': data}, status_code)
+
+
+def _error_response(exc):
+    if isinstance(exc, exceptions.ValidationError):
+        return _json_response({'errors': exc.detail}, exc.status_code)
+    return _user_response({'detail': exc.detail}, exc.status_code)
+
+
+def _parse_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        raise exceptions.ValidationError({'error': ['Request body must be a JSON object.']})
+    return data
+
+
+def _get_user(email):
+    try:
+        return UserModel.objects.get(email=email)
+    except UserModel.DoesNotExist:
+        raise exceptions.ValidationError({'error': ['User with given email does not exist.']})
+
+
+def _issue_tokens(user, device):
+    data = {
+        'id': user.id,
+        'email': user.email,
+        'access_token': user.access_token,
+        'refresh_token': user.refresh_token
+    }
+    write_refresh_token_to_db(user.id, data['refresh_token'], device)
+    return data
+
+
+def _refresh(request, data):
+    if TokenAuth().authenticate(request) is None:
+        raise exceptions.NotAuthenticated()
+
+    serializer = RefreshTokenSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.data
+
+
+async def _limited(coroutine):
+    # Bound the number of logins in flight; shed load instead of queueing
+    # without limit when a login storm arrives.
+    try:
+        await asyncio.wait_for(_get_semaphore().acquire(), timeout=settings.LOGIN_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        coroutine.close()
+        raise exceptions.Throttled(wait=settings.LOGIN_QUEUE_TIMEOUT)
+    try:
+        return await coroutine
+    finally:
+        _get_semaphore().release()
+
+
+async def _login(data):
+    email = data.get('email', None)
+    password = data.get('password', None)
+    device = data.get('device') or ''
+
+    if email is None:
+        raise exceptions.ValidationError({'email': ['This field is required.']})
+    if password is None:
+        raise exceptions.ValidationError({'password': ['This field is required.']})
+    if not isinstance(device, str) or len(device) > 64:
+        raise exceptions.ValidationError({'device': ['Ensure this field has no more than 64 characters.']})
+
+    user = await sync_to_async(_get_user)(email)
+
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(hashing_pool, check_password, password, user.password):
+        raise exceptions.ValidationError({'error': ['Wrong password.']})
+    if not user.is_active:
+        raise exceptions.ValidationError({'error': ['This user has been deactivated.']})
+
+    return await sync_to_async(_issue_tokens)(user, device)
+
+
+# Django 3.1 view decorators wrap coroutines in sync functions, so method
+# checks and CSRF exemption are done by hand to keep these views async.
+
+async def login(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        data = _parse_body(request)
+        return _user_response(await _limited(_login(data)))
+    except exceptions.APIException as exc:
+        return _error_response(exc)
+
+
+async def refresh_token(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        data = _parse_body(request)
+        return _user_response(await sync_to_async(_refresh)(request, data))
+    except exceptions.APIException as exc:
+        return _error_response(exc)
+
+
+login.csrf_exempt = True
+refresh_token.csrf_exempt = True
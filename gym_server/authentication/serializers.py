@@ -5,7 +5,8 @@ from rest_framework import serializers, exceptions
 from django.contrib.auth.hashers import check_password
 from django.conf import settings
 
-from my_gym.models import UserModel, TokenModel
+from my_gym.models import UserModel
+from my_gym.refresh_tokens import rotate_refresh_token
 
 
 class RegistrationSerializer(serializers.ModelSerializer):
@@ -27,10 +28,11 @@ class LoginSerializer(serializers.ModelSerializer):
     password = serializers.CharField(max_length=128, write_only=True)
     access_token = serializers.CharField(max_length=255, read_only=True)
     refresh_token = serializers.CharField(max_length=255, read_only=True)
+    device = serializers.CharField(max_length=64, required=False, allow_blank=True, write_only=True)
 
     class Meta:
         model = UserModel
-        fields = ('id', 'email', 'password', 'access_token', 'refresh_token')
+        fields = ('id', 'email', 'password', 'access_token', 'refresh_token', 'device')
         read_only_fields = ('access_token', 'refresh_token')
 
     def validate(self, data):
@@ -66,7 +68,8 @@ class LoginSerializer(serializers.ModelSerializer):
             'email': user.email,
             'role': user.role,
             'access_token': user.access_token,
-            'refresh_token': user.refresh_token
+            'refresh_token': user.refresh_token,
+            'device': data.get('device', '')
         }
 
 class RefreshTokenSerializer(serializers.ModelSerializer):
@@ -104,11 +107,16 @@ class RefreshTokenSerializer(serializers.ModelSerializer):
         if is_refresh is None:
             msg = 'Неверный токен. Необходим REFRESH TOKEN.'
             raise exceptions.ValidationError(msg.encode('utf-8'))
-        else:
-            return {
+
+        refresh_token = user.refresh_token
+        if not rotate_refresh_token(user.id, token, payload, refresh_token):
+            msg = 'Ошибка аутентификации. Токен отозван или уже использован.'
+            raise exceptions.AuthenticationFailed(msg.encode('utf-8'))
+
+        return {
             'id': user.id,
             'email': user.email,
             'role': user.role,
             'access_token': user.access_token,
-            'refresh_token': user.refresh_token
+            'refresh_token': refresh_token
         }
\ No newline at end of file
@@ -1,6 +1,9 @@
+from django.urls import path
+
 from rest_framework.routers import DefaultRouter
 
 from .views import RegistrationView, LoginView, RefreshTokenView
+from . import async_views
 
 
 router = DefaultRouter()
@@ -8,4 +11,7 @@ router.register(r'registration', RegistrationView, basename='user')
 router.register(r'login', LoginView, basename='user')
 router.register(r'refresh-token', RefreshTokenView, basename='refresh_token')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls + [
+    path('async/login/', async_views.login, name='async_login'),
+    path('async/refresh-token/', async_views.refresh_token, name='async_refresh_token'),
+]
\ No newline at end of file
@@ -25,7 +25,7 @@ class LoginView(mixins.CreateModelMixin,
         serializer.is_valid(raise_exception=True)
         user_id = serializer.data['id']
         refresh_token = serializer.data['refresh_token']
-        write_refresh_token_to_db(user_id, refresh_token)
+        write_refresh_token_to_db(user_id, refresh_token, serializer.validated_data['device'])
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
@@ -37,10 +37,8 @@ class RefreshTokenView(mixins.CreateModelMixin,
     renderer_classes = (UserJSONRenderer,)
 
     def create(self, request, *args, **kwargs):
+        # RefreshTokenSerializer rotates the stored token while validating.
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user_id = serializer.data['id']
-        refresh_token = serializer.data['refresh_token']
-        write_refresh_token_to_db(user_id, refresh_token)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
@@ -0,0 +1,220 @@
+"""
+Synthetic gym data written straight into the configured database with
+bulk_create. Point DB_NAME (or the other DB_* variables) at a scratch
+database and migrate it first; nothing here cleans up after itself.
+"""
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+BATCH_SIZE = 2000
+
+
+def _bulk_create(model, objs):
+    model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    # Not every backend returns pks from bulk_create, so read them back.
+    return list(model.objects.order_by('-pk').values_list('pk', flat=True)[:len(objs)])[::-1]
+
+
+def generate_staff_clients(clients=100000, staff=200, min_clients=50, max_clients=500, seed=0,
+                           prefix='bench'):
+    """
+    Create `clients` client users and `staff` trainers, each trainer serving
+    a random sample of min_clients..max_clients of those clients. Returns
+    (client_user_ids, staff_profile_ids).
+    """
+    from my_gym.models import UserModel, PositionModel, StaffProfileModel, StaffClientModel
+
+    rng = random.Random(seed)
+    # One hash for every synthetic user: hashing 100k passwords would
+    # dominate the run.
+    password = make_password('benchmark')
+
+    with transaction.atomic():
+        client_ids = []
+        for start in range(0, clients, BATCH_SIZE):
+            users = [UserModel(first_name='Client', last_name=f'N{index}', role=1, password=password,
+                               email=f'{prefix}-client-{seed}-{index}@example.com')
+                     for index in range(start, min(start + BATCH_SIZE, clients))]
+            client_ids.extend(_bulk_create(UserModel, users))
+
+        position = PositionModel.objects.create(name='trainer', duty='benchmark')
+        staff_users = _bulk_create(UserModel, [
+            UserModel(first_name='Staff', last_name=f'N{index}', role=2, password=password,
+                      email=f'{prefix}-staff-{seed}-{index}@example.com')
+            for index in range(staff)])
+        staff_ids = _bulk_create(StaffProfileModel, [StaffProfileModel(user_id=user_id, position=position)
+                                                     for user_id in staff_users])
+
+        assignments = []
+        for staff_id in staff_ids:
+            sample = rng.sample(client_ids, min(len(client_ids), rng.randint(min_clients, max_clients)))
+            assignments.extend(StaffClientModel(staff_id=staff_id, client_id=client_id) for client_id in sample)
+        StaffClientModel.objects.bulk_create(assignments, batch_size=BATCH_SIZE)
+
+    return client_ids, staff_ids
+
+
+FIRST_NAMES = ('Anna', 'Boris', 'Carl', 'Dina', 'Elena', 'Fedor', 'Galina', 'Igor', 'Kira', 'Lev',
+               'Maria', 'Nikita', 'Olga', 'Pavel', 'Roman', 'Sofia', 'Timur', 'Vera', 'Yuri', 'Zoya')
+LAST_NAMES = ('Ivanov', 'Smirnov', 'Kuznetsov', 'Popov', 'Vasiliev', 'Petrov', 'Sokolov', 'Mikhailov',
+              'Novikov', 'Fedorov', 'Morozov', 'Volkov', 'Alekseev', 'Lebedev', 'Semenov', 'Egorov')
+SERVICE_NAMES = ('Yoga', 'Pilates', 'Boxing', 'Crossfit', 'Swimming', 'Stretching', 'Spinning',
+                 'Zumba', 'Kettlebell', 'Aqua aerobics')
+
+
+def generate_client_profiles(clients=100000, services_per_client=3, seed=0, prefix='bench'):
+    """
+    Create services, and `clients` client users with subscriptions and
+    client profiles subscribed to up to `services_per_client` services.
+    Search documents are built with my_gym.search. Returns the client
+    profile ids.
+    """
+    from my_gym.models import UserModel, ServiceModel, SubscriptionModel, ClientProfileModel
+    from my_gym.search import index_profiles
+
+    rng = random.Random(seed)
+    password = make_password('benchmark')
+
+    with transaction.atomic():
+        service_ids = _bulk_create(ServiceModel, [ServiceModel(name=name, time_start='10:00', time_end='11:00')
+                                                  for name in SERVICE_NAMES])
+        through = ClientProfileModel.services.through
+        profile_ids = []
+        for start in range(0, clients, BATCH_SIZE):
+            indexes = range(start, min(start + BATCH_SIZE, clients))
+            user_ids = _bulk_create(UserModel, [
+                UserModel(first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES), role=1,
+                          password=password, email=f'{prefix}-member-{seed}-{index}@example.com')
+                for index in indexes])
+            subscription_ids = _bulk_create(SubscriptionModel, [SubscriptionModel(month=rng.choice((1, 6, 12)))
+                                                                for _ in indexes])
+            ids = _bulk_create(ClientProfileModel, [
+                ClientProfileModel(user_id=user_id, subscription_id=subscription_id,
+                                   expires_on=date.today() + timedelta(days=rng.randint(-90, 365)))
+                for user_id, subscription_id in zip(user_ids, subscription_ids)])
+            through.objects.bulk_create([through(clientprofilemodel_id=profile_id, servicemodel_id=service_id)
+                                         for profile_id in ids
+                                         for service_id in rng.sample(service_ids, rng.randint(0, services_per_client))],
+                                        batch_size=BATCH_SIZE)
+            index_profiles('client', ids)
+            profile_ids.extend(ids)
+
+    return profile_ids
+
+
+def generate_service_slots(slots=50000, overnight_share=0.05, seed=0):
+    """
+    Create `slots` services starting on a 15 minute grid and lasting
+    30-180 minutes; about `overnight_share` of them run past midnight.
+    Returns the service ids.
+    """
+    from my_gym.models import ServiceModel
+
+    rng = random.Random(seed)
+    services = []
+    for index in range(slots):
+        if rng.random() < overnight_share:
+            start = rng.randrange(21 * 60, 24 * 60, 15)
+        else:
+            start = rng.randrange(6 * 60, 21 * 60, 15)
+        end = (start + rng.randrange(30, 181, 15)) % (24 * 60)
+        services.append(ServiceModel(name=f'{rng.choice(SERVICE_NAMES)} {index}',
+                                     time_start=f'{start // 60:02d}:{start % 60:02d}',
+                                     time_end=f'{end // 60:02d}:{end % 60:02d}'))
+    with transaction.atomic():
+        return _bulk_create(ServiceModel, services)
+
+
+BENCHMARK_PASSWORD = 'benchmark'
+
+
+def generate_gym_data(users=10000, staff_share=0.05, services=20, positions=5, min_clients=20, max_clients=200,
+                      seed=0, prefix='bench'):
+    """
+    Create a gym of `users` members: clients with subscriptions of every
+    length, renewed at different dates or never, subscribed to some of
+    `services` services; staff members with one of `positions` positions,
+    each training min_clients..max_clients clients; and one superuser.
+    Everyone's password is BENCHMARK_PASSWORD. Returns a summary with the
+    superuser's email.
+    """
+    from dateutil.relativedelta import relativedelta
+
+    from my_gym.models import (UserModel, ServiceModel, PositionModel, SubscriptionModel, ClientProfileModel,
+                               StaffProfileModel, StaffClientModel)
+    from my_gym.search import index_profiles
+
+    rng = random.Random(seed)
+    password = make_password(BENCHMARK_PASSWORD)
+    today = date.today()
+    staff_count = max(1, int(users * staff_share))
+    client_count = users - staff_count
+
+    with transaction.atomic():
+        admin_email = f'{prefix}-admin-{seed}@example.com'
+        UserModel.objects.bulk_create([UserModel(first_name='Bench', last_name='Admin', email=admin_email, role=0,
+                                                 password=password, is_staff=True, is_superuser=True)])
+
+        service_ids = []
+        for index in range(services):
+            start = rng.randrange(7 * 60, 22 * 60, 30)
+            end = min(start + rng.choice((45, 60, 90)), 24 * 60 - 1)
+            service_ids.append(ServiceModel(name=f'{rng.choice(SERVICE_NAMES)} {index}',
+                                            time_start=f'{start // 60:02d}:{start % 60:02d}',
+                                            time_end=f'{end // 60:02d}:{end % 60:02d}'))
+        service_ids = _bulk_create(ServiceModel, service_ids)
+        position_ids = _bulk_create(PositionModel, [PositionModel(name=f'Position {index}', duty='benchmark')
+                                                    for index in range(positions)])
+
+        through = ClientProfileModel.services.through
+        client_user_ids = []
+        for start in range(0, client_count, BATCH_SIZE):
+            indexes = range(start, min(start + BATCH_SIZE, client_count))
+            user_ids = _bulk_create(UserModel, [
+                UserModel(first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES), role=1,
+                          password=password, email=f'{prefix}-client-{seed}-{index}@example.com')
+                for index in indexes])
+            subscriptions = [SubscriptionModel(month=rng.choice((1, 6, 12)),
+                                               updated_at=(today - timedelta(days=rng.randint(0, 400))
+                                                           if rng.random() < 0.7 else None))
+                             for _ in indexes]
+            subscription_ids = _bulk_create(SubscriptionModel, subscriptions)
+            # As ClientProfileModel.get_expires_on; users are created today.
+            profile_ids = _bulk_create(ClientProfileModel, [
+                ClientProfileModel(user_id=user_id, subscription_id=subscription_id,
+                                   expires_on=(subscription.updated_at or today)
+                                   + relativedelta(months=subscription.month))
+                for user_id, subscription_id, subscription in zip(user_ids, subscription_ids, subscriptions)])
+            through.objects.bulk_create([through(clientprofilemodel_id=profile_id, servicemodel_id=service_id)
+                                         for profile_id in profile_ids
+                                         for service_id in rng.sample(service_ids, rng.randint(0, min(3, services)))],
+                                        batch_size=BATCH_SIZE)
+            index_profiles('client', profile_ids)
+            client_user_ids.extend(user_ids)
+
+        staff_user_ids = _bulk_create(UserModel, [
+            UserModel(first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES), role=2,
+                      password=password, email=f'{prefix}-staff-{seed}-{index}@example.com')
+            for index in range(staff_count)])
+        staff_ids = _bulk_create(StaffProfileModel, [StaffProfileModel(user_id=user_id,
+                                                                       position_id=rng.choice(position_ids))
+                                                     for user_id in staff_user_ids])
+        index_profiles('staff', staff_ids)
+
+        links = []
+        for staff_id in staff_ids:
+            sample = rng.sample(client_user_ids, min(len(client_user_ids), rng.randint(min_clients, max_clients)))
+            links.extend(StaffClientModel(staff_id=staff_id, client_id=client_id) for client_id in sample)
+        StaffClientModel.objects.bulk_create(links, batch_size=BATCH_SIZE)
+
+    return {
+        'admin_email': admin_email,
+        'clients': client_count,
+        'staff': staff_count,
+        'services': services,
+        'positions': positions,
+        'trainer_client_links': len(links),
+    }
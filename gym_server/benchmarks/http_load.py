@@ -0,0 +1,117 @@
+"""
+Concurrent HTTP load against a running server, e.g.
+
+    python -m benchmarks.http_load --url http://127.0.0.1:8000 \\
+        --scenario users --email srj@kach.com --password 87654321
+
+Prints one JSON object with throughput and latency percentiles, so runs
+before and after a settings change can be compared. To compare logins per
+second on WSGI and ASGI, run the login scenario against a WSGI server with
+the default --login-path, then against
+``uvicorn gym_server.asgi:application`` with
+``--login-path /auth/async/login/``.
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(call, repeat):
+    """Median milliseconds of `repeat` calls of `call`."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 3)
+
+
+def request(url, data=None, token=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Token {token}'
+    body = json.dumps(data).encode('utf-8') if data is not None else None
+    req = urllib.request.Request(url, data=body, headers=headers)
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return response.status, response.read()
+
+
+def login(base_url, email, password, path='/auth/login/'):
+    status, body = request(base_url + path, {'email': email, 'password': password})
+    return json.loads(body)['user']['access_token']
+
+
+def build_scenario(args):
+    credentials = {'email': args.email, 'password': args.password}
+    if args.scenario == 'login':
+        return lambda: request(args.url + args.login_path, credentials)
+    token = login(args.url, args.email, args.password)
+    if args.scenario == 'users':
+        return lambda: request(f'{args.url}/api/users/?role={args.role}', token=token)
+    if args.scenario == 'services':
+        return lambda: request(f'{args.url}/api/services/', token=token)
+    raise ValueError(f'Unknown scenario: {args.scenario}')
+
+
+def run(call, total, concurrency):
+    def timed(_):
+        started = time.perf_counter()
+        try:
+            call()
+            ok = True
+        except (urllib.error.URLError, OSError):
+            ok = False
+        return ok, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for ok, latency in outcomes if ok]
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'errors': total - len(latencies),
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+            'p50': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+            'p95': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+            'p99': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--scenario', choices=('users', 'login', 'services'), default='users')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--role', type=int, default=1)
+    parser.add_argument('--login-path', default='/auth/login/')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    result = run(build_scenario(args), args.requests, args.concurrency)
+    result['scenario'] = args.scenario
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.datasets import generate_gym_data
+
+
+class Command(BaseCommand):
+    help = ('Fill the configured database with a synthetic gym for benchmarks. Use a scratch '
+            'database; run again with another --seed or --prefix to add more data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--staff-share', type=float, default=0.05, help='Share of users that are staff.')
+        parser.add_argument('--services', type=int, default=20)
+        parser.add_argument('--positions', type=int, default=5)
+        parser.add_argument('--min-clients', type=int, default=20, help='Fewest clients per trainer.')
+        parser.add_argument('--max-clients', type=int, default=200, help='Most clients per trainer.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='bench', help='Prefix of generated emails.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        summary = generate_gym_data(users=options['users'], staff_share=options['staff_share'],
+                                    services=options['services'], positions=options['positions'],
+                                    min_clients=options['min_clients'], max_clients=options['max_clients'],
+                                    seed=options['seed'], prefix=options['prefix'])
+        summary['seconds'] = round(time.perf_counter() - started, 1)
+        self.stdout.write(json.dumps(summary, indent=2))
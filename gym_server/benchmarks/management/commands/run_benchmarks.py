@@ -0,0 +1,79 @@
+import json
+import platform
+from datetime import datetime
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+
+from benchmarks.datasets import BENCHMARK_PASSWORD
+from benchmarks.scenarios import (InProcessTransport, HTTPTransport, build_scenarios, get_fixtures, login,
+                                  run_scenario)
+
+SCENARIOS = ('login', 'refresh_token', 'list_clients', 'list_staff', 'filter_created_gt', 'filter_search',
+             'filter_service_name', 'filter_expired', 'filter_position_name', 'filter_client_id',
+             'filter_clients_id', 'retrieve_client', 'retrieve_staff', 'update_client', 'list_services')
+
+
+class Command(BaseCommand):
+    help = ('Run API scenarios against data from generate_gym_data, in-process or against --url, '
+            'and print throughput, p50/p95/p99 latency and query counts per scenario as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                            help='Repeat to pick scenarios; all by default.')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per scenario.')
+        parser.add_argument('--url', help='Base URL of a running server; in-process when omitted.')
+        parser.add_argument('--response-cache', action='store_true',
+                            help='Serve in-process list scenarios from the response cache. Off by default, so '
+                                 'they measure filtering and serialization; a --url server follows its own '
+                                 'RESPONSE_CACHE setting.')
+        parser.add_argument('--email', help='Superuser to run as. Defaults to the generated one.')
+        parser.add_argument('--password', default=BENCHMARK_PASSWORD)
+        parser.add_argument('--prefix', default='bench', help='Email prefix given to generate_gym_data.')
+        parser.add_argument('--label', default='', help='Stored in the output to tell runs apart.')
+        parser.add_argument('--output', help='Also write the JSON result to this file.')
+
+    def handle(self, *args, **options):
+        from my_gym.models import UserModel
+
+        email = options['email'] or (UserModel.objects
+                                     .filter(is_superuser=True, email__startswith=f"{options['prefix']}-admin-")
+                                     .order_by('pk').values_list('email', flat=True).first())
+        if email is None:
+            raise CommandError('No benchmark superuser, run generate_gym_data or pass --email.')
+
+        if options['url']:
+            result = self.run(HTTPTransport(options['url']), email, options)
+        else:
+            with override_settings(SERVER_TIMING=True, RESPONSE_CACHE=options['response_cache']):
+                result = self.run(InProcessTransport(), email, options)
+
+        output = json.dumps(result, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output + '\n')
+        self.stdout.write(output)
+
+    def run(self, transport, email, options):
+        from my_gym.models import UserModel, ClientProfileModel, StaffProfileModel
+
+        admin_token = login(transport, email, options['password'])['access_token']
+        scenarios = build_scenarios(transport, admin_token, options['password'], get_fixtures())
+        results = {}
+        for name in options['scenario'] or SCENARIOS:
+            results[name] = run_scenario(scenarios[name], options['requests'], options['warmup'])
+        return {
+            'label': options['label'],
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'target': options['url'] or 'in-process',
+            'environment': {'python': platform.python_version(), 'django': django.get_version(),
+                            'database': connection.vendor,
+                            'response_cache': None if options['url'] else options['response_cache']},
+            'dataset': {'users': UserModel.objects.count(),
+                        'client_profiles': ClientProfileModel.objects.count(),
+                        'staff_profiles': StaffProfileModel.objects.count()},
+            'scenarios': results,
+        }
@@ -0,0 +1,166 @@
+"""
+Scripted API scenarios for `manage.py run_benchmarks`, run in-process
+through the Django test client or over HTTP against a local server.
+Query counts are read from the Server-Timing header
+(my_gym.instrumentation), so a server must run with SERVER_TIMING=1 to
+report them.
+"""
+import json
+import re
+import statistics
+import time
+import urllib.error
+import urllib.request
+from datetime import date, timedelta
+
+from .http_load import percentile
+
+QUERIES_PATTERN = re.compile(r'desc="(\d+) queries"')
+
+
+class InProcessTransport:
+    def __init__(self):
+        from django.test import Client
+
+        self.client = Client()
+
+    def request(self, method, path, data=None, token=None):
+        extra = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        body = json.dumps(data) if data is not None else None
+        call = getattr(self.client, method.lower())
+        if body is None:
+            response = call(path, **extra)
+        else:
+            response = call(path, body, content_type='application/json', **extra)
+        return response.status_code, response.get('Server-Timing'), response.content
+
+
+class HTTPTransport:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        body = json.dumps(data).encode('utf-8') if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                return response.status, response.headers.get('Server-Timing'), response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.headers.get('Server-Timing'), error.read()
+
+
+def login(transport, email, password, device=''):
+    status, _, body = transport.request('POST', '/auth/login/', {'email': email, 'password': password,
+                                                                 'device': device})
+    if status != 201:
+        raise RuntimeError(f'Login as {email} failed with {status}: {body[:200]!r}')
+    return json.loads(body)['user']
+
+
+def get_fixtures():
+    """Ids and names the scenarios query, read from the benchmark dataset."""
+    from my_gym.models import ClientProfileModel, StaffProfileModel, StaffClientModel, ServiceModel
+
+    client = ClientProfileModel.objects.select_related('user').order_by('pk').first()
+    staff = StaffProfileModel.objects.select_related('position').order_by('pk').first()
+    service = ServiceModel.objects.order_by('pk').first()
+    if client is None or staff is None or service is None:
+        raise RuntimeError('No benchmark data, run manage.py generate_gym_data first.')
+    trained = list(StaffClientModel.objects.order_by('client_id').values_list('client_id', flat=True)[:5])
+    return {
+        'client_email': client.user.email,
+        'client_profile_id': client.pk,
+        'client_last_name': client.user.last_name,
+        'staff_profile_id': staff.pk,
+        'position_name': staff.position.name,
+        'service_name': service.name.split()[0],
+        'trained_client_ids': trained or [client.user_id],
+    }
+
+
+def build_scenarios(transport, admin_token, password, fixtures):
+    """Scenario name -> callable running one request and returning (status, Server-Timing)."""
+
+    def get(path):
+        return lambda: transport.request('GET', path, token=admin_token)[:2]
+
+    # Its own device, so the login scenario does not replace its refresh token.
+    client_session = login(transport, fixtures['client_email'], password, device='benchmark-refresh')
+
+    def login_client():
+        return transport.request('POST', '/auth/login/', {'email': fixtures['client_email'],
+                                                          'password': password})[:2]
+
+    def refresh_token():
+        status, timing, body = transport.request('POST', '/auth/refresh-token/',
+                                                 {'refresh_token': client_session['refresh_token']},
+                                                 token=client_session['access_token'])
+        if status == 201:
+            # Refresh tokens are single use.
+            client_session.update(json.loads(body)['user'])
+        return status, timing
+
+    first_names = iter(range(10 ** 9))
+
+    def update_client():
+        data = {'updated_data': {'user': {'first_name': f'Bench{next(first_names) % 2}'}}}
+        return transport.request('PATCH', f"/api/users/{fixtures['client_profile_id']}/?role=1", data,
+                                 token=admin_token)[:2]
+
+    created_after = (date.today() - timedelta(days=1)).isoformat()
+    clients_id = ','.join(str(pk) for pk in fixtures['trained_client_ids'])
+    return {
+        'login': login_client,
+        'refresh_token': refresh_token,
+        'list_clients': get('/api/users/?role=1'),
+        'list_staff': get('/api/users/?role=2'),
+        'filter_created_gt': get(f'/api/users/?role=1&created_gt={created_after}'),
+        'filter_search': get(f"/api/users/?role=1&search={fixtures['client_last_name']}"),
+        'filter_service_name': get(f"/api/users/?role=1&service_name={fixtures['service_name']}"),
+        'filter_expired': get('/api/users/?role=1&expired=true'),
+        'filter_position_name': get(f"/api/users/?role=2&position_name={fixtures['position_name']}"),
+        'filter_client_id': get(f"/api/users/?role=2&client_id={fixtures['trained_client_ids'][0]}"),
+        'filter_clients_id': get(f'/api/users/?role=2&clients_id={clients_id}'),
+        'retrieve_client': get(f"/api/users/{fixtures['client_profile_id']}/?role=1"),
+        'retrieve_staff': get(f"/api/users/{fixtures['staff_profile_id']}/?role=2"),
+        'update_client': update_client,
+        'list_services': get('/api/services/'),
+    }
+
+
+def run_scenario(call, requests, warmup=0):
+    for _ in range(warmup):
+        call()
+
+    latencies, queries, errors = [], [], 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_started = time.perf_counter()
+        status, timing = call()
+        latencies.append(time.perf_counter() - request_started)
+        if status >= 400:
+            errors += 1
+        match = QUERIES_PATTERN.search(timing or '')
+        if match:
+            queries.append(int(match.group(1)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': requests,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+            'p50': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+            'p95': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+            'p99': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        },
+        'queries': {
+            'mean': round(statistics.mean(queries), 2) if queries else None,
+            'max': max(queries) if queries else None,
+        },
+    }
@@ -0,0 +1,98 @@
+"""
+Schedule queries on a synthetic set of service slots, e.g.
+
+    DB_NAME=/tmp/bench.sqlite3 python manage.py migrate
+    DB_NAME=/tmp/bench.sqlite3 python -m benchmarks.schedule --generate
+
+Runs the `at=` and `overlaps=` ServiceFilter queries as plain interval
+conditions and narrowed by the longest slot (my_gym.schedule), with the
+(time_start, time_end) index and again with the index dropped inside a
+rolled back transaction, so the database is left as it was (this needs
+transactional DDL: SQLite or PostgreSQL). Prints one JSON object with
+median milliseconds.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import time as clock
+
+from .http_load import measure
+
+
+class Rollback(Exception):
+    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--generate', action='store_true', help='Create the synthetic slots first.')
+    parser.add_argument('--slots', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gym_server.settings')
+    import django
+    django.setup()
+
+    from django.db import connection, transaction
+
+    from my_gym.schedule import get_longest_slot, slots_running_at, slots_overlapping
+    from my_gym.models import ServiceModel
+    from .datasets import generate_service_slots
+
+    if args.generate:
+        started = time.perf_counter()
+        generate_service_slots(slots=args.slots, seed=args.seed)
+        print(f'Generated slots in {time.perf_counter() - started:.1f}s')
+
+    services = ServiceModel.objects.all()
+    longest = get_longest_slot()
+    queries = {}
+    for bound, suffix in ((None, 'scan'), (longest, 'bounded')):
+        queries.update({
+            f'at_morning_{suffix}': slots_running_at(clock(7, 10), bound),
+            f'at_evening_{suffix}': slots_running_at(clock(18, 30), bound),
+            f'at_after_midnight_{suffix}': slots_running_at(clock(0, 30), bound),
+            f'overlaps_hour_{suffix}': slots_overlapping(clock(18), clock(19), bound),
+            f'overlaps_overnight_{suffix}': slots_overlapping(clock(23, 30), clock(1), bound),
+        })
+
+    # Same shape as the first page of /api/services/?at=...
+    def page(condition):
+        return lambda: list(services.filter(condition).order_by('id')[:51])
+
+    def count(condition):
+        return lambda: services.filter(condition).count()
+
+    def run():
+        results = {}
+        for name, condition in queries.items():
+            results[f'{name}_page'] = measure(page(condition), args.repeat)
+            results[f'{name}_count'] = measure(count(condition), args.repeat)
+        return results
+
+    indexed = run()
+    matches = {name: services.filter(condition).count() for name, condition in queries.items()}
+
+    index_name = ServiceModel._meta.indexes[0].name
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(index_name)}')
+            unindexed = run()
+            raise Rollback
+    except Rollback:
+        pass
+
+    print(json.dumps({
+        'slots': services.count(),
+        'longest_slot_minutes': round(longest / 60),
+        'matches': matches,
+        'median_ms': {'indexed': indexed, 'no_index': unindexed},
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Profile search latency on a synthetic dataset, e.g.
+
+    DB_NAME=/tmp/bench.sqlite3 python manage.py migrate
+    DB_NAME=/tmp/bench.sqlite3 python -m benchmarks.search --generate
+
+Times the first page of client profiles for a set of queries two ways:
+the LIKE '%...%' scan over users and services the contains filters used
+to run, and ProfileFilter's ranked `search` on the search index. Prints
+one JSON object with p50/p95 milliseconds.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from .http_load import measure, percentile
+
+
+def latency(call, queries, repeat):
+    timings = [measure(lambda: call(query), 1) for _ in range(repeat) for query in queries]
+    return {
+        'p50': percentile(timings, 0.50),
+        'p95': percentile(timings, 0.95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--generate', action='store_true', help='Create the synthetic dataset first.')
+    parser.add_argument('--clients', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gym_server.settings')
+    import django
+    django.setup()
+
+    from django.db.models import Q
+    from django.http import QueryDict
+
+    from my_gym.filters import ProfileFilter
+    from my_gym.models import ClientProfileModel
+    from my_gym.search import get_search_backend
+    from .datasets import FIRST_NAMES, LAST_NAMES, SERVICE_NAMES, generate_client_profiles
+
+    if args.generate:
+        started = time.perf_counter()
+        generate_client_profiles(clients=args.clients, seed=args.seed)
+        print(f'Generated dataset in {time.perf_counter() - started:.1f}s')
+
+    rng = random.Random(args.seed)
+    queries = ([name.lower()[:4] for name in rng.sample(FIRST_NAMES, 5)]
+               + [name.lower() for name in rng.sample(LAST_NAMES, 5)]
+               + [name.lower()[1:5] for name in rng.sample(SERVICE_NAMES, 5)]
+               + [f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'.lower() for _ in range(5)])
+    profiles = ClientProfileModel.objects.select_related('user', 'subscription')
+    limit = args.page_size + 1
+
+    def like_scan(query):
+        condition = Q()
+        for term in query.split():
+            condition &= (Q(user__first_name__icontains=term) | Q(user__last_name__icontains=term)
+                          | Q(user__email__icontains=term) | Q(services__name__icontains=term))
+        return list(profiles.filter(condition).distinct().order_by('user_id', 'id')[:limit])
+
+    def indexed_search(query):
+        queryset = ProfileFilter(QueryDict(mutable=True) | {'search': query}, queryset=profiles).qs
+        return list(queryset.order_by('-search_rank', 'id')[:limit])
+
+    print(json.dumps({
+        'profiles': ClientProfileModel.objects.count(),
+        'backend': type(get_search_backend()).__name__,
+        'queries': len(queries),
+        'latency_ms': {
+            'like_scan': latency(like_scan, queries, args.repeat),
+            'indexed_search': latency(indexed_search, queries, args.repeat),
+        },
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Profile serialization throughput on the benchmark dataset, e.g.
+
+    DB_NAME=/tmp/bench.sqlite3 python manage.py migrate
+    DB_NAME=/tmp/bench.sqlite3 python manage.py generate_gym_data
+    DB_NAME=/tmp/bench.sqlite3 python -m benchmarks.serialization
+
+Compares ClientProfileSerializer/StaffProfileSerializer over prefetched
+instances with the values()-based my_gym.representations, both end to end
+(queries included) and for the serialization step alone, on pages of
+--rows profiles. Checks that both render the same JSON and prints one
+JSON object with rows serialized per second.
+"""
+import argparse
+import json
+import os
+
+from .http_load import measure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500, help='Profiles per page.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gym_server.settings')
+    import django
+    django.setup()
+
+    from rest_framework.renderers import JSONRenderer
+
+    from my_gym.models import ClientProfileModel, StaffProfileModel
+    from my_gym.query_plans import ClientProfileQueryPlan, StaffProfileQueryPlan
+    from my_gym.representations import ClientProfileRepresentation, StaffProfileRepresentation
+    from my_gym.serializers import ClientProfileSerializer, StaffProfileSerializer
+
+    cases = {
+        'clients': (ClientProfileModel, ClientProfileQueryPlan, ClientProfileSerializer, ClientProfileRepresentation),
+        'staff': (StaffProfileModel, StaffProfileQueryPlan, StaffProfileSerializer, StaffProfileRepresentation),
+    }
+    renderer = JSONRenderer()
+    results = {}
+    for name, (model, plan_class, serializer_class, representation_class) in cases.items():
+        ordered = model.objects.order_by('user_id', 'id')
+        instances_query = plan_class(action='retrieve').apply(ordered)
+        representation = representation_class()
+
+        def load_instances():
+            return list(instances_query[:args.rows])
+
+        def load_rows():
+            return list(representation.values(ordered)[:args.rows])
+
+        instances, rows = load_instances(), load_rows()
+        context = representation.get_context(rows)
+        rows_count = len(rows)
+        if renderer.render(serializer_class(instances, many=True).data) != renderer.render(
+                representation.from_rows(rows)):
+            raise SystemExit(f'{name}: representations differ')
+
+        timings = {
+            'serializer_end_to_end': measure(lambda: serializer_class(load_instances(), many=True).data,
+                                             args.repeat),
+            'representation_end_to_end': measure(lambda: representation.from_rows(load_rows()), args.repeat),
+            'serializer_only': measure(lambda: serializer_class(instances, many=True).data, args.repeat),
+            'representation_only': measure(lambda: [representation.build(row, context) for row in rows],
+                                           args.repeat),
+        }
+        results[name] = {
+            'rows': rows_count,
+            'nested_objects': sum(len(item[key]) for item in representation.from_rows(rows)
+                                  for key in ('services', 'clients') if key in item),
+            'rows_per_second': {key: round(rows_count * 1000 / milliseconds)
+                                for key, milliseconds in timings.items()},
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Staff-by-clients lookups on a synthetic dataset, e.g.
+
+    DB_NAME=/tmp/bench.sqlite3 python manage.py migrate
+    DB_NAME=/tmp/bench.sqlite3 python -m benchmarks.staff_clients --generate
+
+Compares the JOIN + DISTINCT the clients_id filter used to run, a
+correlated EXISTS, and the IN (subquery) semi-join ProfileFilter runs
+now, plus the reverse "trainers of these clients" lookup. Prints one JSON
+object with median milliseconds.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from .http_load import measure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--generate', action='store_true', help='Create the synthetic dataset first.')
+    parser.add_argument('--clients', type=int, default=100000)
+    parser.add_argument('--staff', type=int, default=200)
+    parser.add_argument('--lookup-size', type=int, default=20, help='Client ids per lookup.')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gym_server.settings')
+    import django
+    django.setup()
+
+    from django.db.models import Exists, OuterRef
+
+    from my_gym.models import StaffProfileModel, StaffClientModel
+    from .datasets import generate_staff_clients
+
+    if args.generate:
+        started = time.perf_counter()
+        generate_staff_clients(clients=args.clients, staff=args.staff, seed=args.seed)
+        print(f'Generated dataset in {time.perf_counter() - started:.1f}s')
+
+    client_ids = list(StaffClientModel.objects.values_list('client_id', flat=True).distinct())
+    rng = random.Random(args.seed)
+    lookup = rng.sample(client_ids, min(args.lookup_size, len(client_ids)))
+    single = lookup[0]
+
+    # Same shape as the first page of /api/users/?role=2&clients_id=...
+    def page(queryset):
+        return list(queryset.select_related('user').order_by('user_id', 'id')[:51])
+
+    staff = StaffProfileModel.objects.all()
+
+    def join_distinct():
+        return page(staff.filter(clients__id__in=lookup).distinct())
+
+    def exists():
+        return page(staff.filter(Exists(StaffClientModel.objects.filter(staff=OuterRef('pk'),
+                                                                        client_id__in=lookup))))
+
+    def in_subquery():
+        return page(staff.filter(pk__in=StaffClientModel.objects.filter(client_id__in=lookup)
+                                                                 .values('staff_id')))
+
+    def join_single():
+        return page(staff.filter(clients__id=single))
+
+    def exists_single():
+        return page(staff.filter(Exists(StaffClientModel.objects.filter(staff=OuterRef('pk'),
+                                                                        client_id=single))))
+
+    def in_subquery_single():
+        return page(staff.filter(pk__in=StaffClientModel.objects.filter(client_id=single)
+                                                                 .values('staff_id')))
+
+    def trainers():
+        return list(StaffClientModel.objects.filter(client_id__in=lookup)
+                    .values_list('client_id', 'staff_id', 'staff__user_id'))
+
+    assert join_distinct() == exists() == in_subquery()
+
+    print(json.dumps({
+        'staff': StaffProfileModel.objects.count(),
+        'assignments': StaffClientModel.objects.count(),
+        'lookup_size': len(lookup),
+        'median_ms': {
+            'clients_id_join_distinct': measure(join_distinct, args.repeat),
+            'clients_id_exists': measure(exists, args.repeat),
+            'clients_id_in_subquery': measure(in_subquery, args.repeat),
+            'client_id_join': measure(join_single, args.repeat),
+            'client_id_exists': measure(exists_single, args.repeat),
+            'client_id_in_subquery': measure(in_subquery_single, args.repeat),
+            'trainers_lookup': measure(trainers, args.repeat),
+        },
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
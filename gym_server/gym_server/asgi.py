@@ -3,6 +3,11 @@ ASGI config for gym_server project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Served by an ASGI server, e.g. ``uvicorn gym_server.asgi:application``, the
+async login views in authentication.async_views (/auth/async/login/ and
+/auth/async/refresh-token/) run on the event loop and only hand password
+hashing and ORM calls to threads.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 """
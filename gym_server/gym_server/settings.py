@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+import django
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,9 +44,11 @@ INSTALLED_APPS = [
     'django_filters',
     'authentication',
     'my_gym',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'my_gym.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,11 +82,56 @@ WSGI_APPLICATION = 'gym_server.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# The backend is chosen through DB_* environment variables; SQLite stays the
+# default for local development.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.sqlite3')
+
+if DB_ENGINE == 'django.db.backends.sqlite3':
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            'OPTIONS': {
+                # Seconds a writer waits on a locked database before failing.
+                'timeout': int(os.environ.get('SQLITE_TIMEOUT', 20)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': os.environ.get('DB_NAME', 'my_gym'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            # Honoured by Django 4.1+: ping persistent connections before reuse.
+            'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+            'OPTIONS': {},
+        }
     }
+    # Server-side pool for psycopg 3 (Django 5.1+). Pooled connections are
+    # returned to the pool, so they must not also be persistent.
+    if (DB_ENGINE == 'django.db.backends.postgresql'
+            and os.environ.get('DB_POOL', '0') == '1'
+            and django.VERSION >= (5, 1)):
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+        }
+
+# Applied to every new SQLite connection by my_gym.signals.
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 268435456,
 }
 
 
@@ -137,3 +187,103 @@ REST_FRAMEWORK = {
 }
 
 AUTH_USER_MODEL = 'my_gym.UserModel'
+
+# Verified access tokens kept in memory by my_gym.backends.TokenAuth
+
+TOKEN_CACHE_MAX_SIZE = 10000
+
+TOKEN_CACHE_TTL = 300
+
+# Opt-in access tokens that carry role, is_active and is_superuser claims, so
+# TokenAuth can authenticate without reading the users table. They are
+# short-lived: revoking one on another process takes at most this many seconds.
+
+STATELESS_ACCESS_TOKENS = False
+
+STATELESS_ACCESS_TOKEN_LIFETIME = 300
+
+# Caches
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+# Services and positions are cached in the 'reference' cache. LocMemCache is
+# per process, so REFERENCE_CACHE_TIMEOUT also bounds how stale another
+# worker can be; REFERENCE_CACHE_BACKEND=file shares it between processes.
+
+REFERENCE_CACHE_ALIAS = 'reference'
+
+REFERENCE_CACHE_TIMEOUT = int(os.environ.get('REFERENCE_CACHE_TIMEOUT', 60))
+
+# List responses (my_gym.response_cache) share the 'reference' cache with the
+# generations that key them. Requests for a key being computed wait for it
+# up to RESPONSE_CACHE_LEASE seconds before computing it themselves.
+# RESPONSE_CACHE=0 computes every response, e.g. to benchmark the views.
+
+RESPONSE_CACHE = os.environ.get('RESPONSE_CACHE', '1') == '1'
+
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 60))
+
+RESPONSE_CACHE_LEASE = float(os.environ.get('RESPONSE_CACHE_LEASE', 10))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reference': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'reference',
+    },
+}
+
+if os.environ.get('REFERENCE_CACHE_BACKEND') == 'file':
+    CACHES['reference'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('REFERENCE_CACHE_LOCATION', BASE_DIR / '.cache' / 'reference'),
+    }
+
+# Async login (authentication.async_views): threads hashing passwords, logins
+# in flight per event loop, and seconds a login may wait for a slot before
+# being answered with 429.
+
+LOGIN_HASHING_THREADS = int(os.environ.get('LOGIN_HASHING_THREADS', 4))
+
+LOGIN_MAX_CONCURRENCY = int(os.environ.get('LOGIN_MAX_CONCURRENCY', 64))
+
+LOGIN_QUEUE_TIMEOUT = float(os.environ.get('LOGIN_QUEUE_TIMEOUT', 5))
+
+# Bulk member onboarding (POST /api/users/bulk/): rows accepted per request
+# and threads hashing their passwords.
+
+ONBOARDING_MAX_ROWS = int(os.environ.get('ONBOARDING_MAX_ROWS', 5000))
+
+ONBOARDING_HASHING_THREADS = int(os.environ.get('ONBOARDING_HASHING_THREADS', 4))
+
+# Request instrumentation (my_gym.instrumentation). Metrics are served at
+# /api/metrics/ to admins and to scrapers sending "Bearer METRICS_TOKEN".
+
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '0') == '1'
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Most SQL queries one request of a view may run, keyed by view label, e.g.
+# 'my_gym.views.UserViewSet.list'. Over budget requests are logged, or fail
+# with QueryBudgetExceeded when QUERY_BUDGET_ACTION is 'raise' (tests).
+# Counts include the user lookup of a token that is not cached yet, and
+# retrieve the version lookup of a revalidation that finds the profile changed.
+
+QUERY_BUDGETS = {
+    'my_gym.views.UserViewSet.list': 4,
+    'my_gym.views.UserViewSet.retrieve': 5,
+    'my_gym.views.UserViewSet.stats': 6,
+    'my_gym.views.UserViewSet.trainers': 2,
+    'my_gym.views.ServiceViewSet.list': 2,
+    'my_gym.views.PositionViewSet.list': 2,
+    'my_gym.views.SubscriptionListView.list': 2,
+    'my_gym.views.SyncView.get': 11,
+}
+
+QUERY_BUDGET_ACTION = os.environ.get('QUERY_BUDGET_ACTION', 'log')
+
+# Delta sync feed (/api/sync/): days a tombstone survives compaction
+# (manage.py compact_changelog). Clients that stay away longer resync.
+
+SYNC_TOMBSTONE_DAYS = int(os.environ.get('SYNC_TOMBSTONE_DAYS', 30))
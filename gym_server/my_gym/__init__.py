@@ -0,0 +1 @@
+default_app_config = 'my_gym.apps.MyGymConfig'
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MyGymConfig(AppConfig):
     name = 'my_gym'
+
+    def ready(self):
+        from . import signals  # noqa: F401
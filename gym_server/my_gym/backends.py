@@ -6,9 +6,15 @@ from rest_framework import exceptions, authentication
 from rest_framework.authentication import TokenAuthentication
 
 from .models import UserModel
+from .token_cache import token_cache, is_token_revoked, TokenUser
 
 
 class TokenAuth(TokenAuthentication):
+    """
+    Authenticates access tokens. request.user is always a TokenUser, whether
+    the token was verified now or found in the token cache: read its
+    attributes, and use its pk (not the object) in ORM lookups.
+    """
     model = UserModel
     authentication_header_prefix = 'Token'
 
@@ -37,8 +43,30 @@ class TokenAuth(TokenAuthentication):
         return self.authenticate_credentials(token)
 
     def authenticate_credentials(self, token):
-        model = self.get_model()
+        cached = token_cache.get(token)
+        if cached is not None:
+            payload, user = cached
+        else:
+            payload = self.decode_token(token)
+            if TokenUser.has_claims(payload):
+                user = TokenUser.from_claims(payload)
+            else:
+                user = TokenUser.from_user(self.get_user(payload))
+
+        if not user.is_active:
+            msg = 'Данный пользователь деактивирован.'
+            raise exceptions.AuthenticationFailed(msg.encode('utf-8'))
+
+        if TokenUser.has_claims(payload) and is_token_revoked(payload):
+            msg = 'Ошибка аутентификации. Токен отозван.'
+            raise exceptions.AuthenticationFailed(msg.encode('utf-8'))
+
+        if cached is None:
+            token_cache.set(token, payload, user)
+
+        return (user, token)
 
+    def decode_token(self, token):
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms="HS256")
         except jwt.ExpiredSignatureError:
@@ -48,14 +76,15 @@ class TokenAuth(TokenAuthentication):
             msg = 'Ошибка аутентификации. Невозможно декодировать токен.'
             raise exceptions.AuthenticationFailed(msg.encode('utf-8'))
 
+        return payload
+
+    def get_user(self, payload):
+        model = self.get_model()
+
         try:
             user = model.objects.get(pk=payload['id'])
         except model.DoesNotExist:
             msg = 'Пользователь соответствующий данному токену не найден.'
             raise exceptions.AuthenticationFailed(msg.encode('utf-8'))
 
-        if not user.is_active:
-            msg = 'Данный пользователь деактивирован.'
-            raise exceptions.AuthenticationFailed(msg.encode('utf-8'))
-
-        return (user, token)
+        return user
@@ -0,0 +1,69 @@
+"""
+Change log behind the /api/sync/ feed (my_gym.sync). Signals and the bulk
+write paths record which profiles, services and positions were written or
+deleted. Compaction keeps the newest entry of each object only and drops
+tombstones older than SYNC_TOMBSTONE_DAYS, which keeps the log about as
+large as the synced tables.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from .models import (
+    ChangeLogModel, ChangeLogCompactionModel, ClientProfileModel, StaffProfileModel, ServiceModel, PositionModel
+)
+
+ENTITIES = {
+    ClientProfileModel: ChangeLogModel.CLIENT,
+    StaffProfileModel: ChangeLogModel.STAFF,
+    ServiceModel: ChangeLogModel.SERVICE,
+    PositionModel: ChangeLogModel.POSITION,
+}
+BATCH_SIZE = 1000
+
+
+def record(model, ids, action=ChangeLogModel.UPSERT):
+    """
+    Log a change of the `model` rows with `ids` once the current transaction
+    commits. Entries get their ids in commit order, so the feed never moves
+    a cursor past a change that is still to commit.
+    """
+    entity = ENTITIES[model]
+    ids = list(ids)
+    if not ids:
+        return
+
+    def write():
+        ChangeLogModel.objects.bulk_create([ChangeLogModel(entity=entity, object_id=pk, action=action)
+                                            for pk in ids], batch_size=BATCH_SIZE)
+
+    transaction.on_commit(write)
+
+
+def get_horizon():
+    """Cursors below this id may have missed tombstones."""
+    return ChangeLogCompactionModel.objects.aggregate(horizon=Max('horizon'))['horizon'] or 0
+
+
+def compact(tombstone_days=None, now=None):
+    """Drop superseded entries and old tombstones; returns the compaction."""
+    if tombstone_days is None:
+        tombstone_days = getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30)
+    now = now or timezone.now()
+
+    with transaction.atomic():
+        newer = ChangeLogModel.objects.filter(entity=OuterRef('entity'), object_id=OuterRef('object_id'),
+                                              id__gt=OuterRef('id'))
+        removed, _ = ChangeLogModel.objects.filter(Exists(newer)).delete()
+
+        tombstones = ChangeLogModel.objects.filter(action=ChangeLogModel.DELETE,
+                                                   created_at__lt=now - timedelta(days=tombstone_days))
+        horizon = tombstones.aggregate(horizon=Max('id'))['horizon']
+        if horizon is not None:
+            removed += tombstones.filter(id__lte=horizon).delete()[0]
+
+        return ChangeLogCompactionModel.objects.create(horizon=max(horizon or 0, get_horizon()),
+                                                       removed=removed)
@@ -1,59 +1,88 @@
+from datetime import datetime
+
 import django_filters
+from django.utils.dateparse import parse_time
+
+from rest_framework import serializers
 
-from django.db.models import Q
+from .models import (PositionModel, SubscriptionModel, ServiceModel, StaffClientModel, SearchDocumentModel)
+from .schedule import get_longest_slot, slots_running_at, slots_overlapping
+from .search import SEARCH_KINDS, get_search_backend
 
-from .models import (PositionModel, SubscriptionModel, ServiceModel)
-from .utils import get_expire_date
+
+def parse_ids(value, name):
+    try:
+        return [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise serializers.ValidationError({name: ['Ids must be a comma separated list of integers.']})
 
 
 class ProfileFilter(django_filters.FilterSet):
     # Filter both profiles by created date
     created_gt = django_filters.DateFilter('user__created_at', lookup_expr='gt')
     created_lt = django_filters.DateFilter('user__created_at', lookup_expr='lt')
+    # Ranked search by name, email and service or position name
+    search = django_filters.CharFilter(method='search_profiles')
     # Filters for ClientProfile  /users/?role=1&...
-    service_name = django_filters.CharFilter('services__name', lookup_expr=['exact', 'contains'])
+    service_name = django_filters.CharFilter(method='search_tags')
     expired = django_filters.BooleanFilter(method='is_expired')
     # Filters for StaffProfile  /users/?role=2&...
-    position_name = django_filters.CharFilter('position__name', lookup_expr=['exact', 'contains'])
+    position_name = django_filters.CharFilter(method='search_tags')
     client_id = django_filters.NumberFilter('clients__id')
     clients_id = django_filters.CharFilter(method='get_staff_by_clients')
 
+    tag_kinds = {'service_name': SearchDocumentModel.CLIENT,
+                 'position_name': SearchDocumentModel.STAFF}
+
+    def search_profiles(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        kind = SEARCH_KINDS[queryset.model]
+        backend = get_search_backend()
+        return (queryset.filter(pk__in=backend.matching_ids(kind, value))
+                        .annotate(search_rank=backend.rank(kind, value)))
+
+    def search_tags(self, queryset, name, value):
+        # Service and position names are matched on the search index
+        # rather than with LIKE '%...%' over the joined tables.
+        kind = SEARCH_KINDS[queryset.model]
+        if kind != self.tag_kinds[name]:
+            return queryset.none()
+        return queryset.filter(pk__in=get_search_backend().matching_ids(kind, value, column='tags'))
+
     def get_staff_by_clients(self, queryset, name, value):
-        clients_id_list = value.split(',')
-        return queryset.filter(clients__id__in=clients_id_list).distinct()
+        # A semi-join on the (client, staff) index: staff rows are not
+        # multiplied by matching clients, so no DISTINCT is needed.
+        clients_id_list = parse_ids(value, name)
+        staff_ids = StaffClientModel.objects.filter(client_id__in=clients_id_list).values('staff_id')
+        return queryset.filter(pk__in=staff_ids)
 
     def is_expired(self, queryset, name, value):
+        today = datetime.now().date()
         if value:
-            return queryset.filter(
-                (Q(subscription__updated_at__isnull=True) & (
-                        Q(subscription__month=1, user__created_at__lt=get_expire_date(month=1)) |
-                        Q(subscription__month=6, user__created_at__lt=get_expire_date(month=6)) |
-                        Q(subscription__month=12, user__created_at__lt=get_expire_date(month=12)))
-                 ) |
-                (Q(subscription__updated_at__isnull=False) & (
-                        Q(subscription__month=1, subscription__updated_at__lt=get_expire_date(month=1)) |
-                        Q(subscription__month=6, subscription__updated_at__lt=get_expire_date(month=6)) |
-                        Q(subscription__month=12, subscription__updated_at__lt=get_expire_date(month=12)))
-                 )
-            )
+            return queryset.filter(expires_on__lte=today)
         else:
-            return queryset.filter(
-                (Q(subscription__updated_at__isnull=True) & (
-                        Q(subscription__month=1, user__created_at__gt=get_expire_date(month=1)) |
-                        Q(subscription__month=6, user__created_at__gt=get_expire_date(month=6)) |
-                        Q(subscription__month=12, user__created_at__gt=get_expire_date(month=12)))
-                 ) |
-                (Q(subscription__updated_at__isnull=False) & (
-                        Q(subscription__month=1, subscription__updated_at__gt=get_expire_date(month=1)) |
-                        Q(subscription__month=6, subscription__updated_at__gt=get_expire_date(month=6)) |
-                        Q(subscription__month=12, subscription__updated_at__gt=get_expire_date(month=12)))
-                 )
-            )
+            return queryset.filter(expires_on__gt=today)
 
 
 class ServiceFilter(django_filters.FilterSet):
     start_gte = django_filters.TimeFilter('time_start', lookup_expr='gte')
     start_lte = django_filters.TimeFilter('time_start', lookup_expr='lte')
+    # Schedule queries  /services/?at=18:30  /services/?overlaps=18:00,19:30
+    at = django_filters.TimeFilter(method='running_at')
+    overlaps = django_filters.CharFilter(method='overlapping')
+
+    def running_at(self, queryset, name, value):
+        return queryset.filter(slots_running_at(value, get_longest_slot()))
+
+    def overlapping(self, queryset, name, value):
+        try:
+            start, end = (parse_time(item.strip()) for item in value.split(','))
+        except ValueError:
+            start = end = None
+        if start is None or end is None or start == end:
+            raise serializers.ValidationError({name: ['Expected two different times: start,end.']})
+        return queryset.filter(slots_overlapping(start, end, get_longest_slot()))
 
     class Meta:
         model = ServiceModel
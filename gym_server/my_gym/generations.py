@@ -0,0 +1,58 @@
+"""
+Generation counters of the tables behind cached data. Writes to a group of
+tables bump its generation, so cache keys built from the current
+generations stop matching and old entries simply expire. Generations are
+nanosecond timestamps rather than counters, so an evicted generation key
+can never be reissued.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+USERS = 'users'
+CLIENT_PROFILES = 'client_profiles'
+STAFF_PROFILES = 'staff_profiles'
+SUBSCRIPTIONS = 'subscriptions'
+SERVICES = 'services'
+POSITIONS = 'positions'
+
+
+def _cache():
+    return caches[getattr(settings, 'REFERENCE_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 60)
+
+
+def _key(name):
+    return f'generation:{name}'
+
+
+def get_generations(*names):
+    cache = _cache()
+    keys = [_key(name) for name in names]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, time.time_ns(), _timeout())
+            generations[key] = cache.get(key)
+    return tuple(generations[key] for key in keys)
+
+
+def get_generation(name):
+    return get_generations(name)[0]
+
+
+def bump(*names):
+    """
+    Start new generations of `names` once the current transaction commits,
+    so nothing cached under them can miss the write.
+    """
+    def start():
+        now = time.time_ns()
+        _cache().set_many({_key(name): now for name in names}, _timeout())
+
+    transaction.on_commit(start)
@@ -0,0 +1,239 @@
+"""
+Per-view request metrics kept in process: SQL query count, DB time,
+response rendering time and total latency, as Prometheus histograms.
+
+InstrumentationMiddleware measures each request; a wrapper installed on
+every database connection (my_gym.signals) times the queries it runs.
+Bodies of streaming responses are produced after the middleware returns
+and are not measured. Every worker process keeps its own histograms.
+"""
+import asyncio
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _format_labels(labels):
+    return ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                    for name, value in labels)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.series[key] = self.series.get(key, 0) + 1
+
+    def samples(self):
+        with self._lock:
+            series = dict(self.series)
+        for key, value in sorted(series.items()):
+            yield f'{self.name}{{{_format_labels(key)}}} {value}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        # labels -> [count per bucket..., sum, count]
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self.series.items()}
+        for key, values in sorted(series.items()):
+            labels = _format_labels(key)
+            for bound, count in zip(self.buckets, values):
+                yield f'{self.name}_bucket{{{labels},le="{bound}"}} {count}'
+            yield f'{self.name}_bucket{{{labels},le="+Inf"}} {values[-1]}'
+            yield f'{self.name}_sum{{{labels}}} {values[-2]}'
+            yield f'{self.name}_count{{{labels}}} {values[-1]}'
+
+
+class Registry:
+    def __init__(self):
+        self.requests = Counter('my_gym_requests_total', 'Requests by view and status code.')
+        self.duration = Histogram('my_gym_request_duration_seconds', 'Total request latency.',
+                                  SECONDS_BUCKETS)
+        self.db_time = Histogram('my_gym_request_db_seconds', 'Time spent in SQL queries per request.',
+                                 SECONDS_BUCKETS)
+        self.serialize_time = Histogram('my_gym_request_serialize_seconds',
+                                        'Time spent rendering the response body.', SECONDS_BUCKETS)
+        self.queries = Histogram('my_gym_request_queries', 'SQL queries per request.', QUERY_BUCKETS)
+        self.budget_exceeded = Counter('my_gym_query_budget_exceeded_total',
+                                       'Requests that ran more queries than QUERY_BUDGETS allows.')
+        self.metrics = (self.requests, self.duration, self.db_time, self.serialize_time,
+                        self.queries, self.budget_exceeded)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'queries', 'db_time', 'serialize_time', 'serialize_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serialize_started = None
+
+    def start_serialize(self):
+        self.serialize_started = time.perf_counter()
+
+    def stop_serialize(self, response=None):
+        if self.serialize_started is not None:
+            self.serialize_time += time.perf_counter() - self.serialize_started
+            self.serialize_started = None
+
+
+current_metrics = ContextVar('my_gym_request_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper counting and timing the queries of the current request."""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def get_view_label(request):
+    """'my_gym.views.UserViewSet.list' for viewsets, 'module.function' for plain views."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view = match.func
+    view_class = getattr(view, 'cls', None)
+    if view_class is None:
+        return f'{view.__module__}.{view.__name__}'
+    method = request.method.lower()
+    action = (getattr(view, 'actions', None) or {}).get(method, method)
+    return f'{view_class.__module__}.{view_class.__name__}.{action}'
+
+
+def check_query_budget(view, queries):
+    budget = getattr(settings, 'QUERY_BUDGETS', {}).get(view)
+    if budget is None or queries <= budget:
+        return
+    registry.budget_exceeded.inc(view=view)
+    message = f'{view} ran {queries} SQL queries, its budget is {budget}.'
+    if getattr(settings, 'QUERY_BUDGET_ACTION', 'log') == 'raise':
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def _milliseconds(seconds):
+    return round(seconds * 1000, 2)
+
+
+def finish_request(request, response, metrics):
+    total = time.perf_counter() - metrics.started
+    view = get_view_label(request)
+    registry.requests.inc(view=view, status=response.status_code)
+    registry.duration.observe(total, view=view)
+    registry.db_time.observe(metrics.db_time, view=view)
+    registry.serialize_time.observe(metrics.serialize_time, view=view)
+    registry.queries.observe(metrics.queries, view=view)
+
+    if getattr(settings, 'SERVER_TIMING', False):
+        response['Server-Timing'] = (f'db;dur={_milliseconds(metrics.db_time)};desc="{metrics.queries} queries", '
+                                     f'serialize;dur={_milliseconds(metrics.serialize_time)}, '
+                                     f'total;dur={_milliseconds(total)}')
+    check_query_budget(view, metrics.queries)
+    return response
+
+
+class InstrumentationMiddleware:
+    """Put it first in MIDDLEWARE so the whole request is measured."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the instance as async for Django's middleware loader.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return finish_request(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return finish_request(request, response, metrics)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook.
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.start_serialize()
+            response.add_post_render_callback(metrics.stop_serialize)
+        return response
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from my_gym.changelog import compact
+
+
+class Command(BaseCommand):
+    help = 'Drop superseded change log entries and old tombstones of the /api/sync/ feed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tombstone-days', type=int,
+                            help='Defaults to the SYNC_TOMBSTONE_DAYS setting.')
+
+    def handle(self, *args, **options):
+        compaction = compact(tombstone_days=options['tombstone_days'])
+        self.stdout.write(f'Removed {compaction.removed} change log entries; '
+                          f'cursors below {compaction.horizon} must resync.')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from my_gym.models import SearchDocumentModel
+from my_gym.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the profile search documents from scratch.'
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        self.stdout.write(f'Indexed {SearchDocumentModel.objects.count()} profiles.')
@@ -0,0 +1,16 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from my_gym.stats import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Store the unfiltered member dashboard stats of one day, served by /users/stats/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Defaults to today.')
+
+    def handle(self, *args, **options):
+        snapshot = take_snapshot(today=options['date'])
+        self.stdout.write(f"Stored stats of {snapshot.date}: {snapshot.data['clients']['total']} clients.")
@@ -0,0 +1,57 @@
+import csv
+import json
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from my_gym.renewals import renew_subscriptions, sweep_subscriptions
+
+
+class Command(BaseCommand):
+    help = ('Renew subscriptions in bulk, or sweep all client profiles to '
+            'refresh expires_on and report which subscriptions are expired.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=('renew', 'sweep'))
+        parser.add_argument('--ids', help='Comma separated subscription ids to renew.')
+        parser.add_argument('--file', help='CSV file with "id" and optional "month" columns.')
+        parser.add_argument('--month', type=int, help='New subscription length for every renewed row.')
+        parser.add_argument('--date', type=date.fromisoformat,
+                            help='Renewal date, or the sweep reference date. Defaults to today.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--report', action='store_true', help='Print one JSON line per row.')
+
+    def handle(self, *args, **options):
+        if options['action'] == 'renew':
+            results = renew_subscriptions(self.get_renewals(options),
+                                          renewed_at=options['date'],
+                                          batch_size=options['batch_size'])
+        else:
+            results = sweep_subscriptions(today=options['date'],
+                                          batch_size=options['batch_size'])
+
+        if options['report']:
+            for result in results:
+                self.stdout.write(json.dumps(result, default=str))
+
+        summary = Counter(result['status'] for result in results)
+        self.stdout.write(', '.join(f'{status}: {count}' for status, count in sorted(summary.items()))
+                          or 'Nothing to do.')
+
+    def get_renewals(self, options):
+        renewals = []
+        if options['ids']:
+            renewals.extend({'id': int(pk)} for pk in options['ids'].split(','))
+        if options['file']:
+            with open(options['file'], newline='') as csv_file:
+                for row in csv.DictReader(csv_file):
+                    month = row.get('month')
+                    renewals.append({'id': int(row['id']), 'month': int(month) if month else None})
+        if not renewals:
+            raise CommandError('Pass subscription ids with --ids or --file.')
+
+        if options['month']:
+            for renewal in renewals:
+                renewal['month'] = options['month']
+        return renewals
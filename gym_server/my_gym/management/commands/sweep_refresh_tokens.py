@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from my_gym.refresh_tokens import sweep_expired_refresh_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete expired refresh tokens in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between batches.')
+
+    def handle(self, *args, **options):
+        deleted = sweep_expired_refresh_tokens(batch_size=options['batch_size'],
+                                               pause=options['pause'])
+        self.stdout.write(f'Deleted {deleted} expired refresh tokens.')
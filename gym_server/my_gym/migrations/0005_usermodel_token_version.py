@@ -0,0 +1,18 @@
+# Generated by Django 3.1.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_gym', '0004_auto_20210215_2320'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usermodel',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.6 on 2026-10-18 12:30
+
+from dateutil.relativedelta import relativedelta
+
+from django.db import migrations, models
+
+
+def backfill_expires_on(apps, schema_editor):
+    ClientProfileModel = apps.get_model('my_gym', 'ClientProfileModel')
+    profiles = ClientProfileModel.objects.select_related('user', 'subscription').order_by('pk')
+
+    batch = []
+    for profile in profiles.iterator(chunk_size=1000):
+        start = profile.subscription.updated_at or profile.user.created_at
+        profile.expires_on = start + relativedelta(months=profile.subscription.month)
+        batch.append(profile)
+        if len(batch) == 1000:
+            ClientProfileModel.objects.bulk_update(batch, ['expires_on'])
+            batch = []
+    if batch:
+        ClientProfileModel.objects.bulk_update(batch, ['expires_on'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_gym', '0005_usermodel_token_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientprofilemodel',
+            name='expires_on',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_expires_on, migrations.RunPython.noop),
+    ]
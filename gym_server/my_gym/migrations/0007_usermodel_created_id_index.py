@@ -0,0 +1,17 @@
+# Generated by Django 3.1.6 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_gym', '0006_clientprofilemodel_expires_on'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usermodel',
+            index=models.Index(fields=['created_at', 'id'], name='my_gym_user_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.1.6 on 2026-10-18 14:00
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def dedupe_tokens(apps, schema_editor):
+    # Keep the newest token of every user; older rows were left behind by
+    # concurrent logins and are never read.
+    TokenModel = apps.get_model('my_gym', 'TokenModel')
+    latest = (TokenModel.objects.values('user_id')
+              .annotate(latest_id=Max('id'))
+              .values_list('latest_id', flat=True))
+    TokenModel.objects.exclude(id__in=list(latest)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_gym', '0007_usermodel_created_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_tokens, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tokenmodel',
+            constraint=models.UniqueConstraint(fields=('user',), name='my_gym_token_user_uniq'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 3.1.6 on 2026-10-18 14:30
+
+import hashlib
+from datetime import datetime, timezone
+
+import jwt
+
+from django.db import migrations, models
+
+
+def hash_stored_tokens(apps, schema_editor):
+    # Tokens issued so far carry no jti, so they are keyed by the whole token.
+    TokenModel = apps.get_model('my_gym', 'TokenModel')
+    now = datetime.now(tz=timezone.utc)
+
+    batch = []
+    for token in TokenModel.objects.order_by('pk').iterator(chunk_size=1000):
+        token.token_hash = hashlib.sha256(token.refresh_token.encode('utf-8')).hexdigest()
+        try:
+            payload = jwt.decode(token.refresh_token, options={'verify_signature': False})
+            token.expires_at = datetime.fromtimestamp(payload['exp'], tz=timezone.utc)
+        except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
+            token.expires_at = now
+        batch.append(token)
+        if len(batch) == 1000:
+            TokenModel.objects.bulk_update(batch, ['token_hash', 'expires_at'])
+            batch = []
+    if batch:
+        TokenModel.objects.bulk_update(batch, ['token_hash', 'expires_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_gym', '0008_tokenmodel_user_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tokenmodel',
+            name='device',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='tokenmodel',
+            name='expires_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='tokenmodel',
+            name='token_hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.RunPython(hash_stored_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tokenmodel',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='tokenmodel',
+            name='token_hash',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+        migrations.RemoveField(
+            model_name='tokenmodel',
+            name='refresh_token',
+        ),
+        migrations.RemoveConstraint(
+            model_name='tokenmodel',
+            name='my_gym_token_user_uniq',
+        ),
+        migrations.AddConstraint(
+            model_name='tokenmodel',
+            constraint=models.UniqueConstraint(fields=('user', 'device'), name='my_gym_token_user_device_uniq'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.1.6 on 2026-10-18 15:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_gym', '0009_refresh_token_store'),
+    ]
+
+    operations = [
+        # The table already exists as the implicit through model of
+        # StaffProfileModel.clients, so only the migration state changes.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='StaffClientModel',
+                    fields=[
+                        ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('client', models.ForeignKey(db_column='usermodel_id', on_delete=django.db.models.deletion.CASCADE, to='my_gym.usermodel')),
+                        ('staff', models.ForeignKey(db_column='staffprofilemodel_id', on_delete=django.db.models.deletion.CASCADE, to='my_gym.staffprofilemodel')),
+                    ],
+                    options={
+                        'db_table': 'my_gym_staffprofilemodel_clients',
+                        'unique_together': {('staff', 'client')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='staffprofilemodel',
+                    name='clients',
+                    field=models.ManyToManyField(related_name='clients', through='my_gym.StaffClientModel', to='my_gym.UserModel'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='staffclientmodel',
+            index=models.Index(fields=['client', 'staff'], name='my_gym_staffclient_client_idx'),
+        ),
+    ]
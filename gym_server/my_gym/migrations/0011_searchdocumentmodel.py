@@ -0,0 +1,100 @@
+# Generated by Django 3.1.6 on 2026-10-18 15:30
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+SQLITE_INDEX = [
+    "CREATE VIRTUAL TABLE my_gym_searchindex USING fts5("
+    "name, email, tags, content='my_gym_searchdocumentmodel', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER my_gym_searchindex_ai AFTER INSERT ON my_gym_searchdocumentmodel BEGIN "
+    "INSERT INTO my_gym_searchindex(rowid, name, email, tags) VALUES (new.id, new.name, new.email, new.tags); END",
+    "CREATE TRIGGER my_gym_searchindex_ad AFTER DELETE ON my_gym_searchdocumentmodel BEGIN "
+    "INSERT INTO my_gym_searchindex(my_gym_searchindex, rowid, name, email, tags) "
+    "VALUES ('delete', old.id, old.name, old.email, old.tags); END",
+    "CREATE TRIGGER my_gym_searchindex_au AFTER UPDATE ON my_gym_searchdocumentmodel BEGIN "
+    "INSERT INTO my_gym_searchindex(my_gym_searchindex, rowid, name, email, tags) "
+    "VALUES ('delete', old.id, old.name, old.email, old.tags); "
+    "INSERT INTO my_gym_searchindex(rowid, name, email, tags) VALUES (new.id, new.name, new.email, new.tags); END",
+]
+
+POSTGRESQL_INDEX = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX my_gym_search_document_trgm ON my_gym_searchdocumentmodel USING gin (document gin_trgm_ops)",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(SQLITE_INDEX[0])
+        except OperationalError:
+            # No FTS5 trigram tokenizer (SQLite < 3.34): my_gym.search
+            # falls back to icontains on the document table.
+            return
+        for statement in SQLITE_INDEX[1:]:
+            schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        for statement in POSTGRESQL_INDEX:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS my_gym_searchindex')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS my_gym_search_document_trgm')
+
+
+def backfill_documents(apps, schema_editor):
+    SearchDocumentModel = apps.get_model('my_gym', 'SearchDocumentModel')
+    ClientProfileModel = apps.get_model('my_gym', 'ClientProfileModel')
+    StaffProfileModel = apps.get_model('my_gym', 'StaffProfileModel')
+
+    def document(kind, pk, first_name, last_name, email, tags):
+        name = f'{first_name} {last_name}'
+        return SearchDocumentModel(kind=kind, object_id=pk, name=name, email=email, tags=tags,
+                                   document=' '.join((name, email, tags)).lower())
+
+    services = {}
+    for profile_id, service_name in (ClientProfileModel.services.through.objects
+                                     .order_by('servicemodel_id')
+                                     .values_list('clientprofilemodel_id', 'servicemodel__name')
+                                     .iterator()):
+        services.setdefault(profile_id, []).append(service_name)
+
+    documents = [document('client', pk, first_name, last_name, email, ' '.join(services.get(pk, ())))
+                 for pk, first_name, last_name, email in ClientProfileModel.objects.values_list(
+                     'pk', 'user__first_name', 'user__last_name', 'user__email').iterator()]
+    documents.extend(document('staff', pk, first_name, last_name, email, position_name)
+                     for pk, first_name, last_name, email, position_name in StaffProfileModel.objects.values_list(
+                         'pk', 'user__first_name', 'user__last_name', 'user__email', 'position__name').iterator())
+    SearchDocumentModel.objects.bulk_create(documents, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_gym', '0010_staffclientmodel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocumentModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('client', 'Client profile'), ('staff', 'Staff profile')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=51)),
+                ('email', models.CharField(max_length=254)),
+                ('tags', models.TextField(blank=True)),
+                ('document', models.TextField()),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.6 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_gym', '0011_searchdocumentmodel'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicemodel',
+            index=models.Index(fields=['time_start', 'time_end'], name='my_gym_service_time_idx'),
+        ),
+    ]
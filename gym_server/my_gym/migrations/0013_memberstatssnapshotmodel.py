@@ -0,0 +1,22 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_gym', '0012_servicemodel_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberStatsSnapshotModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('data', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.1.6 on 2026-10-18 22:10
+
+from django.db import migrations, models
+
+
+# Model name -> ChangeLogModel entity.
+ENTITIES = {
+    'ClientProfileModel': 'client',
+    'StaffProfileModel': 'staff',
+    'ServiceModel': 'service',
+    'PositionModel': 'position',
+}
+
+
+def log_existing_rows(apps, schema_editor):
+    # Lets a first sync (without a cursor) read every current row.
+    ChangeLogModel = apps.get_model('my_gym', 'ChangeLogModel')
+    for model_name, entity in ENTITIES.items():
+        ids = apps.get_model('my_gym', model_name).objects.order_by('pk').values_list('pk', flat=True)
+        ChangeLogModel.objects.bulk_create((ChangeLogModel(entity=entity, object_id=pk, action='upsert')
+                                            for pk in ids.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_gym', '0014_profile_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('client', 'Client profile'), ('staff', 'Staff profile'), ('service', 'Service'), ('position', 'Position')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Inserted or updated'), ('delete', 'Deleted')], default='upsert', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChangeLogCompactionModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('horizon', models.PositiveIntegerField(default=0)),
+                ('removed', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='changelogmodel',
+            index=models.Index(fields=['entity', 'object_id', 'id'], name='my_gym_changelog_object_idx'),
+        ),
+        migrations.RunPython(log_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.6 on 2026-10-18 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_gym', '0015_changelog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clientprofilemodel',
+            index=models.Index(fields=['user', 'id'], name='my_gym_client_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staffprofilemodel',
+            index=models.Index(fields=['user', 'id'], name='my_gym_staff_user_id_idx'),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.http import HttpResponseNotFound
 
+from rest_framework import status
+from rest_framework.response import Response
+
 from .errors import RoleURLParamError
+from .response_cache import response_cache
 
 
 class CheckValidParamMixin:
@@ -12,4 +16,39 @@ class CheckValidParamMixin:
         if role != 1 and role != 2:
             return HttpResponseNotFound(RoleURLParamError.msg)
         else:
-            return super(CheckValidParamMixin, self).dispatch(request, *args, **kwargs)
\ No newline at end of file
+            return super(CheckValidParamMixin, self).dispatch(request, *args, **kwargs)
+
+
+class CachedListMixin:
+    """
+    Serves `list` from my_gym.response_cache. Responses are keyed by the
+    query, the caller's permission class and the generations of
+    `cache_dependencies`; the key doubles as the ETag, so clients can
+    revalidate with If-None-Match and get a 304.
+    """
+    cache_dependencies = ()
+
+    def get_cache_dependencies(self):
+        return self.cache_dependencies
+
+    def get_cache_scope(self, request):
+        # Everything the permission classes of the cached views look at.
+        user = request.user
+        return getattr(user, 'role', None), user.is_staff, user.is_superuser
+
+    def get_cache_variant(self, request):
+        """Anything else the response depends on, e.g. today's date."""
+        return ()
+
+    def cached_list(self, request, compute):
+        name = f'{self.__class__.__module__}.{self.__class__.__name__}'
+        key = response_cache.make_key(name, request, self.get_cache_scope(request),
+                                      self.get_cache_dependencies(), self.get_cache_variant(request))
+        headers = {'ETag': f'"{key}"'}
+
+        if headers['ETag'] in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(response_cache.get_or_compute(key, compute), headers=headers)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_list(request, lambda: super(CachedListMixin, self).list(request, *args, **kwargs).data)
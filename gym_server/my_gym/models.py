@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from uuid import uuid4
 
 from dateutil.relativedelta import relativedelta
 
@@ -9,6 +10,9 @@ from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
 
 from django.db import models
+from django.db.models import F
+from django.db.models.expressions import Combinable
+from django.utils import timezone
 
 from .user_manager import UserManager
 
@@ -22,15 +26,43 @@ class UserModel(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     created_at = models.DateField(auto_now_add=True)
     updated_at = models.DateField(auto_now=True)
+    # Bumped whenever a claim carried by stateless access tokens changes,
+    # which revokes the tokens issued before.
+    token_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name', 'role']
+    TOKEN_CLAIMS = ('email', 'role', 'is_active', 'is_staff', 'is_superuser')
 
     objects = UserManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='my_gym_user_created_id_idx'),
+        ]
+
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_claims = {name: value for name, value in zip(field_names, values)
+                                   if name in cls.TOKEN_CLAIMS}
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded_claims = getattr(self, '_loaded_claims', None)
+        if loaded_claims and any(getattr(self, name) != value for name, value in loaded_claims.items()):
+            self.token_version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'token_version'}
+        super().save(*args, **kwargs)
+        deferred_fields = self.get_deferred_fields()
+        self._loaded_claims = {name: getattr(self, name) for name in self.TOKEN_CLAIMS
+                               if name not in deferred_fields}
+
     @property
     def access_token(self):
         return self._generate_access_token()
@@ -46,6 +78,9 @@ class UserModel(AbstractBaseUser, PermissionsMixin):
         return f"{self.first_name[0]}.{self.last_name}"
 
     def _generate_access_token(self):
+        if getattr(settings, 'STATELESS_ACCESS_TOKENS', False):
+            return self._generate_claims_access_token()
+
         date = datetime.now() + timedelta(hours=1)
 
         token = jwt.encode({
@@ -55,12 +90,26 @@ class UserModel(AbstractBaseUser, PermissionsMixin):
 
         return token
 
+    def _generate_claims_access_token(self):
+        date = datetime.now() + timedelta(seconds=settings.STATELESS_ACCESS_TOKEN_LIFETIME)
+
+        payload = {name: getattr(self, name) for name in self.TOKEN_CLAIMS}
+        payload.update({
+            'id': self.pk,
+            'ver': self.token_version,
+            'exp': date
+        })
+        token = jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+
+        return token
+
     def _generate_refresh_token(self):
         date = datetime.now() + timedelta(days=30)
 
         token = jwt.encode({
             'id': self.pk,
             'refresh': 0,
+            'jti': uuid4().hex,
             'exp': date
         }, settings.SECRET_KEY, algorithm='HS256')
 
@@ -69,7 +118,15 @@ class UserModel(AbstractBaseUser, PermissionsMixin):
 
 class TokenModel(models.Model):
     user = models.ForeignKey(UserModel, on_delete=models.CASCADE)
-    refresh_token = models.CharField(max_length=255)
+    # sha256 of the refresh token jti, the token itself is not stored.
+    token_hash = models.CharField(max_length=64, unique=True)
+    device = models.CharField(max_length=64, blank=True, default='')
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'device'], name='my_gym_token_user_device_uniq'),
+        ]
 
     def __str__(self):
         return self.user.email
@@ -97,36 +154,189 @@ class PositionModel(models.Model):
 class ServiceModel(models.Model):
     name = models.CharField(max_length=255)
     time_start = models.TimeField()
+    # Earlier than time_start for slots running past midnight.
     time_end = models.TimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['time_start', 'time_end'], name='my_gym_service_time_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 
-class ClientProfileModel(models.Model):
+class VersionedProfileModel(models.Model):
+    """
+    A profile whose version and modified_at move whenever its
+    representation may change (my_gym.versions). Saves increment the version
+    in SQL, so a stale instance can never write an older one back.
+    """
+    version = models.PositiveIntegerField(default=1)
+    modified_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version = F('version') + 1
+            self.modified_at = timezone.now()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'version', 'modified_at'}
+        super().save(*args, **kwargs)
+        if isinstance(self.version, Combinable):
+            # Deferred: read back from the database on first access.
+            del self.__dict__['version']
+
+
+class ClientProfileModel(VersionedProfileModel):
     user = models.ForeignKey(UserModel, on_delete=models.CASCADE)
     subscription = models.ForeignKey(SubscriptionModel, on_delete=models.CASCADE)
     services = models.ManyToManyField(ServiceModel)
+    # Denormalized from subscription.month/updated_at and user.created_at,
+    # kept in sync by ClientProfileSerializer.
+    expires_on = models.DateField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Keyset ordering of the profile list (UserViewSet).
+            models.Index(fields=['user', 'id'], name='my_gym_client_user_id_idx'),
+        ]
 
     @property
     def is_expired(self):
-        if self.subscription.updated_at is None:
-            expired = self.create_expired(self.user.created_at)
-        else:
-            expired = self.create_expired(self.subscription.updated_at)
+        expired = self.expires_on or self.get_expires_on()
         if datetime.now().date() >= expired:
             return True
         return False
 
+    def get_expires_on(self):
+        if self.subscription.updated_at is None:
+            return self.create_expired(self.user.created_at)
+        return self.create_expired(self.subscription.updated_at)
+
     def create_expired(self, date):
         expired = date + relativedelta(months=self.subscription.month)
         return expired
 
+    def save(self, *args, **kwargs):
+        if self.expires_on is None:
+            self.expires_on = self.get_expires_on()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.user.email
 
 
-class StaffProfileModel(models.Model):
+class StaffProfileModel(VersionedProfileModel):
     user = models.ForeignKey(UserModel, on_delete=models.CASCADE, related_name='staff')
     position = models.ForeignKey(PositionModel, on_delete=models.CASCADE)
-    clients = models.ManyToManyField(UserModel, related_name='clients')
+    clients = models.ManyToManyField(UserModel, related_name='clients', through='StaffClientModel')
+
+    class Meta:
+        indexes = [
+            # Keyset ordering of the profile list (UserViewSet).
+            models.Index(fields=['user', 'id'], name='my_gym_staff_user_id_idx'),
+        ]
+
+
+class StaffClientModel(models.Model):
+    # Keeps the table and columns Django created for the implicit
+    # StaffProfileModel.clients through model.
+    staff = models.ForeignKey(StaffProfileModel, on_delete=models.CASCADE, db_column='staffprofilemodel_id')
+    client = models.ForeignKey(UserModel, on_delete=models.CASCADE, db_column='usermodel_id')
+
+    class Meta:
+        db_table = 'my_gym_staffprofilemodel_clients'
+        unique_together = (('staff', 'client'),)
+        indexes = [
+            # Reverse direction of the (staff, client) unique index: the
+            # trainers of a client.
+            models.Index(fields=['client', 'staff'], name='my_gym_staffclient_client_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.staff_id} -> {self.client_id}"
+
+
+class SearchDocumentModel(models.Model):
+    """
+    Searchable text of one client or staff profile, maintained by
+    my_gym.search. SQLite mirrors it into an FTS5 trigram table and
+    PostgreSQL indexes `document` with pg_trgm (see migration 0011).
+    """
+    CLIENT = 'client'
+    STAFF = 'staff'
+    KINDS = [(CLIENT, 'Client profile'),
+             (STAFF, 'Staff profile')]
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    name = models.CharField(max_length=51)
+    email = models.CharField(max_length=254)
+    # Service names of a client, position name of a staff member.
+    tags = models.TextField(blank=True)
+    # Lowercased name, email and tags.
+    document = models.TextField()
+
+    class Meta:
+        unique_together = (('kind', 'object_id'),)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+
+class MemberStatsSnapshotModel(models.Model):
+    """Unfiltered member dashboard stats of one day, see my_gym.stats."""
+    date = models.DateField(unique=True)
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"stats {self.date}"
+
+
+class ChangeLogModel(models.Model):
+    """
+    An insert, update or deletion of an entity served by /api/sync/,
+    recorded by my_gym.changelog. The id is the feed's cursor.
+    """
+    CLIENT = 'client'
+    STAFF = 'staff'
+    SERVICE = 'service'
+    POSITION = 'position'
+    ENTITIES = [(CLIENT, 'Client profile'),
+                (STAFF, 'Staff profile'),
+                (SERVICE, 'Service'),
+                (POSITION, 'Position')]
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTIONS = [(UPSERT, 'Inserted or updated'),
+               (DELETE, 'Deleted')]
+    entity = models.CharField(max_length=10, choices=ENTITIES)
+    object_id = models.PositiveIntegerField()
+    action = models.CharField(max_length=10, choices=ACTIONS, default=UPSERT)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Compaction looks up later entries of the same object.
+            models.Index(fields=['entity', 'object_id', 'id'], name='my_gym_changelog_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id}: {self.action} {self.entity} {self.object_id}"
+
+
+class ChangeLogCompactionModel(models.Model):
+    """
+    A compaction of the change log. Tombstones up to `horizon` are gone, so
+    older cursors can no longer be served.
+    """
+    horizon = models.PositiveIntegerField(default=0)
+    removed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"compaction up to {self.horizon}"
@@ -0,0 +1,241 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from .models import (
+    UserModel, SubscriptionModel, ClientProfileModel, StaffProfileModel, ServiceModel, PositionModel,
+    SearchDocumentModel
+)
+from .search import index_profiles
+from .changelog import record
+from . import generations
+from .serializers import ClientOnboardingSerializer, StaffOnboardingSerializer
+from .utils import CHUNK_SIZE, chunks
+
+CREATED = 'created'
+INVALID = 'invalid'
+
+CLIENT_ROLE = 1
+STAFF_ROLE = 2
+
+
+def _existing(queryset, field, values):
+    values = list(values)
+    found = set()
+    for chunk in chunks(values, CHUNK_SIZE):
+        found.update(queryset.filter(**{f'{field}__in': chunk}).values_list(field, flat=True))
+    return found
+
+
+def _bulk_create(model, objs, batch_size, key=None):
+    """
+    bulk_create that leaves a primary key on every object. Where the
+    database returns no rows from a bulk insert, the keys are read back by
+    `key`, a field unique among the new rows, or the objects are saved one
+    by one when there is none.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs, batch_size=batch_size)
+    if key is None:
+        for obj in objs:
+            obj.save(force_insert=True)
+        return objs
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    pks = {}
+    for chunk in chunks([getattr(obj, key) for obj in objs], CHUNK_SIZE):
+        pks.update(model.objects.filter(**{f'{key}__in': chunk}).values_list(key, 'pk'))
+    for obj in objs:
+        obj.pk = pks[getattr(obj, key)]
+    return objs
+
+
+def _bulk_create_m2m(model, field_name, pairs, batch_size):
+    field = model._meta.get_field(field_name)
+    through = field.remote_field.through
+    source, target = f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+    through.objects.bulk_create([through(**{source: source_id, target: target_id})
+                                 for source_id, target_id in pairs],
+                                batch_size=batch_size)
+
+
+class MemberOnboarding(ABC):
+    """
+    Creates users and their profiles from a list of rows in bulk. Rows are
+    validated first, all references are checked with one query per chunk,
+    passwords are hashed in a thread pool, and the valid rows are inserted
+    with bulk_create in one transaction. Invalid rows are reported and
+    skipped.
+    """
+    serializer_class = None
+    profile_model = None
+    role = None
+    # Row field -> model its primary keys must exist in.
+    references = {}
+    search_kind = None
+    # Generations of the cached lists the created rows appear in.
+    cache_generations = ()
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+
+    def run(self, rows):
+        results = [None] * len(rows)
+        valid = []
+        for number, row in enumerate(rows, start=1):
+            serializer = self.serializer_class(data=row)
+            if serializer.is_valid():
+                valid.append((number, serializer.validated_data))
+            else:
+                results[number - 1] = {'row': number, 'status': INVALID, 'errors': serializer.errors}
+
+        valid = self.check_emails(valid, results)
+        valid = self.check_references(valid, results)
+
+        if valid:
+            passwords = self.hash_passwords([data['password'] for _, data in valid])
+            with transaction.atomic():
+                created = self.create(valid, passwords)
+                # bulk_create sends no post_save, so index and log the
+                # profiles and start new generations here.
+                index_profiles(self.search_kind, [profile.pk for profile in created])
+                record(self.profile_model, [profile.pk for profile in created])
+                generations.bump(*self.cache_generations)
+            for (number, _), profile in zip(valid, created):
+                results[number - 1] = {'row': number, 'status': CREATED,
+                                       'id': profile.pk, 'user_id': profile.user_id}
+        return results
+
+    def check_emails(self, valid, results):
+        taken = _existing(UserModel.objects.all(), 'email', {data['email'] for _, data in valid})
+        seen = set()
+        checked = []
+        for number, data in valid:
+            email = data['email']
+            if email in taken:
+                error = 'User with this email already exists.'
+            elif email in seen:
+                error = 'Duplicate email in this request.'
+            else:
+                error = None
+            seen.add(email)
+            if error:
+                results[number - 1] = {'row': number, 'status': INVALID, 'errors': {'email': [error]}}
+            else:
+                checked.append((number, data))
+        return checked
+
+    def check_references(self, valid, results):
+        for field, model in self.references.items():
+            wanted = set()
+            for _, data in valid:
+                wanted.update(self._ids(data, field))
+            existing = _existing(model.objects.all(), 'pk', wanted)
+
+            checked = []
+            for number, data in valid:
+                missing = [pk for pk in self._ids(data, field) if pk not in existing]
+                if missing:
+                    errors = [f'Invalid pk "{pk}" - object does not exist.' for pk in missing]
+                    results[number - 1] = {'row': number, 'status': INVALID, 'errors': {field: errors}}
+                else:
+                    checked.append((number, data))
+            valid = checked
+        return valid
+
+    @staticmethod
+    def _ids(data, field):
+        value = data.get(field)
+        if value is None:
+            return []
+        return value if isinstance(value, list) else [value]
+
+    @staticmethod
+    def hash_passwords(passwords):
+        # PBKDF2 releases the GIL, so the hashes are computed in parallel.
+        with ThreadPoolExecutor(max_workers=settings.ONBOARDING_HASHING_THREADS) as pool:
+            return list(pool.map(make_password, passwords))
+
+    def create_users(self, valid, passwords):
+        users = [UserModel(first_name=data['first_name'],
+                           last_name=data['last_name'],
+                           email=data['email'],
+                           role=self.role,
+                           password=password)
+                 for (_, data), password in zip(valid, passwords)]
+        return _bulk_create(UserModel, users, self.batch_size, key='email')
+
+    @abstractmethod
+    def create(self, valid, passwords):
+        """Create the users and profiles of the `valid` rows; returns the profiles."""
+
+
+class ClientOnboarding(MemberOnboarding):
+    serializer_class = ClientOnboardingSerializer
+    profile_model = ClientProfileModel
+    role = CLIENT_ROLE
+    search_kind = SearchDocumentModel.CLIENT
+    references = {'services': ServiceModel}
+    cache_generations = (generations.USERS, generations.SUBSCRIPTIONS, generations.CLIENT_PROFILES)
+
+    def create(self, valid, passwords):
+        users = self.create_users(valid, passwords)
+        subscriptions = _bulk_create(SubscriptionModel,
+                                     [SubscriptionModel(month=data.get('month', 1),
+                                                        updated_at=data.get('updated_at'))
+                                      for _, data in valid],
+                                     self.batch_size)
+
+        profiles = []
+        for user, subscription in zip(users, subscriptions):
+            profile = ClientProfileModel(user=user, subscription=subscription)
+            profile.expires_on = profile.get_expires_on()
+            profiles.append(profile)
+        # The users are new, so each has this one profile.
+        _bulk_create(ClientProfileModel, profiles, self.batch_size, key='user_id')
+
+        _bulk_create_m2m(ClientProfileModel, 'services',
+                         [(profile.pk, service_id)
+                          for profile, (_, data) in zip(profiles, valid)
+                          for service_id in dict.fromkeys(data.get('services', []))],
+                         self.batch_size)
+        return profiles
+
+
+class StaffOnboarding(MemberOnboarding):
+    serializer_class = StaffOnboardingSerializer
+    profile_model = StaffProfileModel
+    role = STAFF_ROLE
+    search_kind = SearchDocumentModel.STAFF
+    references = {'position': PositionModel, 'clients': UserModel}
+    cache_generations = (generations.USERS, generations.STAFF_PROFILES)
+
+    def create(self, valid, passwords):
+        users = self.create_users(valid, passwords)
+        profiles = _bulk_create(StaffProfileModel,
+                                [StaffProfileModel(user=user, position_id=data['position'])
+                                 for user, (_, data) in zip(users, valid)],
+                                self.batch_size, key='user_id')
+
+        _bulk_create_m2m(StaffProfileModel, 'clients',
+                         [(profile.pk, client_id)
+                          for profile, (_, data) in zip(profiles, valid)
+                          for client_id in dict.fromkeys(data.get('clients', []))],
+                         self.batch_size)
+        return profiles
+
+
+ONBOARDING_BY_ROLE = {
+    CLIENT_ROLE: ClientOnboarding,
+    STAFF_ROLE: StaffOnboarding,
+}
+
+
+def onboard_members(rows, role, batch_size=1000):
+    """
+    Create members with the given role from `rows` and return one
+    {'row', 'status', ...} result per row, numbered from 1.
+    """
+    return ONBOARDING_BY_ROLE[role](batch_size=batch_size).run(rows)
@@ -0,0 +1,146 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique ordering, e.g. ('user__id', 'id').
+    The cursor carries the ordering values of the last row returned, so
+    every page is a range condition on the ordering columns: no OFFSET and
+    no COUNT(*), and deep pages cost the same as the first one.
+
+    Views choose the ordering with a `keyset_ordering` attribute; a leading
+    '-' marks a descending field. The last field must be unique.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 500
+    ordering = ('id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, 'keyset_ordering', self.ordering)
+        page_size = self.get_page_size(request)
+
+        values, reverse = self.decode_cursor(request)
+        ordering = [self._invert(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        try:
+            if values is not None:
+                queryset = queryset.filter(self.get_keyset_filter(ordering, values))
+            results = list(queryset[:page_size + 1])
+        except (ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        has_next = has_more if not reverse else values is not None
+        has_previous = has_more if reverse else values is not None
+        self.next_values = self.get_values(results[-1]) if has_next and results else None
+        self.previous_values = self.get_values(results[0]) if has_previous and results else None
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        return self.encode_cursor(self.next_values, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_values is None:
+            return None
+        return self.encode_cursor(self.previous_values, reverse=True)
+
+    def get_keyset_filter(self, ordering, values):
+        # (a, b) > (x, y)  ==  a >= x AND (a > x OR (a = x AND b > y)), where
+        # a >= x lets the database seek an index on the ordering instead of
+        # scanning it from the start.
+        conditions = []
+        for index, field in enumerate(ordering):
+            equal = {self._name(name): value for name, value in zip(ordering[:index], values)}
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            conditions.append(Q(**equal, **{f'{self._name(field)}__{lookup}': values[index]}))
+        keyset = reduce(lambda left, right: left | right, conditions)
+        if len(ordering) == 1:
+            return keyset
+        lookup = 'lte' if ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{self._name(ordering[0])}__{lookup}': values[0]}) & keyset
+
+    def get_values(self, instance):
+        # Pages of values() rows carry the ordering fields as keys.
+        if isinstance(instance, dict):
+            return [instance[self._name(field)] for field in self.ordering]
+        values = []
+        for field in self.ordering:
+            value = instance
+            for attr in self._name(field).split('__'):
+                value = getattr(value, attr)
+            values.append(value)
+        return values
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            values, reverse = cursor['v'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def encode_cursor(self, values, reverse):
+        cursor = json.dumps({'v': values, 'r': int(reverse)}, default=str, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    @staticmethod
+    def _name(field):
+        return field.lstrip('-')
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
@@ -0,0 +1,26 @@
+import codecs
+import csv
+
+from django.conf import settings
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class CSVParser(BaseParser):
+    """
+    Parses a CSV body with a header row into a list of dicts. Empty cells
+    are left out, so optional columns may be blank.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            lines = codecs.iterdecode(stream, encoding)
+            return [{column: value for column, value in row.items() if column and value != ''}
+                    for row in csv.DictReader(line.replace('\r', '') for line in lines)]
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ParseError(f'CSV parse error - {exc}')
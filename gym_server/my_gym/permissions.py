@@ -1,3 +1,7 @@
+import hmac
+
+from django.conf import settings
+
 from rest_framework.permissions import BasePermission
 
 
@@ -13,3 +17,12 @@ class StaffOnly(BasePermission):
         return (request.user.is_authenticated
                 and request.user.role == 2
                 and request.user.is_active)
+
+
+class MetricsScraper(BasePermission):
+    """A metrics scraper sending `Authorization: Bearer <METRICS_TOKEN>`."""
+
+    def has_permission(self, request, view):
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        header = request.headers.get('Authorization', '')
+        return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
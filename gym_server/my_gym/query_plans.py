@@ -0,0 +1,79 @@
+from django.db.models import Prefetch
+
+from .models import ServiceModel, UserModel
+from .serializers import UserModelSerializer
+
+
+class ProfileQueryPlan:
+    """
+    Picks select_related joins and prefetches for a profile queryset
+    from the view action and the filters present in the query string.
+    """
+    # Joins the serializer walks when it renders a profile.
+    serializer_joins = ()
+    # Joins that ProfileFilter lookups go through, per filter name.
+    filter_joins = {
+        'created_gt': ('user',),
+        'created_lt': ('user',),
+    }
+    # perform_destroy only touches these relations.
+    destroy_joins = ('user',)
+
+    def __init__(self, action=None, params=None):
+        self.action = action
+        self.params = params or {}
+
+    @property
+    def renders_profile(self):
+        return self.action != 'destroy'
+
+    def get_select_related(self):
+        joins = list(self.serializer_joins if self.renders_profile else self.destroy_joins)
+        for name, paths in self.filter_joins.items():
+            if not self.is_filter_active(name):
+                continue
+            joins.extend(path for path in paths if path not in joins)
+        return joins
+
+    def is_filter_active(self, name):
+        return any(value not in (None, '')
+                   for param, value in self.params.items()
+                   if param == name or param.startswith(name + '__'))
+
+    def get_prefetch_related(self):
+        return []
+
+    def apply(self, queryset):
+        if self.action == 'list':
+            # List pages are read as values() rows by my_gym.representations.
+            return queryset
+        queryset = queryset.select_related(*self.get_select_related())
+        if self.renders_profile:
+            queryset = queryset.prefetch_related(*self.get_prefetch_related())
+        return queryset
+
+
+class ClientProfileQueryPlan(ProfileQueryPlan):
+    serializer_joins = ('user', 'subscription')
+    destroy_joins = ('user', 'subscription')
+
+    def get_prefetch_related(self):
+        # Services are rendered from the reference data cache, only their
+        # ids are needed here. ClientProfileRepresentation uses the same order.
+        return [
+            Prefetch('services', queryset=ServiceModel.objects.only('id').order_by('pk')),
+        ]
+
+
+class StaffProfileQueryPlan(ProfileQueryPlan):
+    # Positions are rendered from the reference data cache by position_id.
+    serializer_joins = ('user',)
+
+    def get_prefetch_related(self):
+        # Clients are rendered with UserModelSerializer, so password hashes
+        # and permission columns are never loaded. StaffProfileRepresentation
+        # uses the same order.
+        return [
+            Prefetch('clients',
+                     queryset=UserModel.objects.only(*UserModelSerializer.Meta.fields).order_by('pk')),
+        ]
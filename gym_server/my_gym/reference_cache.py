@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from . import generations
+from .utils import CHUNK_SIZE, chunks
+
+
+class ReferenceDataCache:
+    """
+    Versioned cache of a rarely changing table, serialized with
+    `serializer_class` one row per entry. Its version is the table's
+    generation (my_gym.generations), so writes orphan every entry stored
+    under the previous one, and only rows that are asked for are loaded
+    again.
+    """
+
+    def __init__(self, name, model, serializer_class):
+        self.name = name
+        self.model = model
+        self.serializer_class = serializer_class
+        self._local = (None, None)
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'REFERENCE_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 60)
+
+    def _key(self, *parts):
+        return ':'.join(('refdata', self.name) + tuple(str(part) for part in parts))
+
+    def get_version(self):
+        return generations.get_generation(self.name)
+
+    def bump(self):
+        generations.bump(self.name)
+
+    def get_many(self, pks):
+        """Serialized rows by pk; pks without a row are left out."""
+        version = self.get_version()
+        local_version, objects = self._local
+        if local_version != version:
+            objects = {}
+            self._local = (version, objects)
+
+        missing = {pk for pk in pks if pk not in objects}
+        if missing:
+            keys = {self._key(version, pk): pk for pk in missing}
+            for key, data in self.cache.get_many(keys).items():
+                objects[keys[key]] = data
+                missing.discard(keys[key])
+        if missing:
+            loaded = {}
+            for chunk in chunks(sorted(missing), CHUNK_SIZE):
+                loaded.update((instance.pk, dict(self.serializer_class(instance).data))
+                              for instance in self.model.objects.filter(pk__in=chunk))
+            self.cache.set_many({self._key(version, pk): data for pk, data in loaded.items()}, self.timeout)
+            objects.update(loaded)
+        return {pk: objects[pk] for pk in pks if pk in objects}
+
+    def get_derived(self, name, build):
+        """A value computed by `build()` from the table, cached under the current version."""
+        key = self._key(self.get_version(), name)
+        value = self.cache.get(key)
+        if value is None:
+            value = build()
+            self.cache.set(key, value, self.timeout)
+        return value
+
+    def get(self, pk):
+        data = self.get_many([pk]).get(pk)
+        return dict(data) if data is not None else None
@@ -0,0 +1,97 @@
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import jwt
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import TokenModel
+
+UPSERT_SQL = {
+    'sqlite': ('INSERT INTO {table} (user_id, device, token_hash, expires_at) VALUES (%s, %s, %s, %s) '
+               'ON CONFLICT (user_id, device) DO UPDATE SET '
+               'token_hash = excluded.token_hash, expires_at = excluded.expires_at'),
+    'postgresql': ('INSERT INTO {table} (user_id, device, token_hash, expires_at) VALUES (%s, %s, %s, %s) '
+                   'ON CONFLICT (user_id, device) DO UPDATE SET '
+                   'token_hash = EXCLUDED.token_hash, expires_at = EXCLUDED.expires_at'),
+    'mysql': ('INSERT INTO {table} (user_id, device, token_hash, expires_at) VALUES (%s, %s, %s, %s) '
+              'ON DUPLICATE KEY UPDATE token_hash = VALUES(token_hash), expires_at = VALUES(expires_at)'),
+}
+
+
+def hash_refresh_token(token, payload):
+    # Tokens issued before jti was added are keyed by the whole token.
+    key = payload.get('jti') or token
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def describe_refresh_token(token):
+    """Return (token_hash, expires_at) of a refresh token issued by UserModel."""
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms="HS256")
+    expires_at = datetime.fromtimestamp(payload['exp'], tz=dt_timezone.utc)
+    return hash_refresh_token(token, payload), expires_at
+
+
+def store_refresh_token(user_id, refresh_token, device=''):
+    """
+    Make `refresh_token` the only valid refresh token of the user on
+    `device`, in one upsert against the (user, device) unique constraint.
+    """
+    token_hash, expires_at = describe_refresh_token(refresh_token)
+
+    sql = UPSERT_SQL.get(connection.vendor)
+    if sql is not None:
+        expires_field = TokenModel._meta.get_field('expires_at')
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(table=connection.ops.quote_name(TokenModel._meta.db_table)),
+                           [user_id, device, token_hash,
+                            expires_field.get_db_prep_value(expires_at, connection)])
+        return
+
+    values = {'token_hash': token_hash, 'expires_at': expires_at}
+    if TokenModel.objects.filter(user_id=user_id, device=device).update(**values):
+        return
+    try:
+        with transaction.atomic():
+            TokenModel.objects.create(user_id=user_id, device=device, **values)
+    except IntegrityError:
+        TokenModel.objects.filter(user_id=user_id, device=device).update(**values)
+
+
+def rotate_refresh_token(user_id, token, payload, new_token):
+    """
+    Swap a stored refresh token for `new_token` in a single UPDATE on the
+    token_hash index. Returns False when `token` is unknown, expired or was
+    already rotated, i.e. it must not be accepted.
+    """
+    new_hash, new_expires_at = describe_refresh_token(new_token)
+    updated = (TokenModel.objects
+               .filter(token_hash=hash_refresh_token(token, payload),
+                       user_id=user_id,
+                       expires_at__gt=timezone.now())
+               .update(token_hash=new_hash, expires_at=new_expires_at))
+    return updated == 1
+
+
+def sweep_expired_refresh_tokens(now=None, batch_size=1000, pause=0):
+    """
+    Delete expired refresh tokens in batches of `batch_size` primary keys,
+    so every DELETE holds its locks briefly. Returns the number of rows
+    deleted.
+    """
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        ids = list(TokenModel.objects
+                   .filter(expires_at__lte=now)
+                   .order_by('expires_at')
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        count, _ = TokenModel.objects.filter(id__in=ids).delete()
+        deleted += count
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,78 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(self.stream(rows)).encode(self.charset)
+
+    def stream(self, rows):
+        for row in rows:
+            yield json.dumps(row, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Flattens nested representations: {'user': {'email': ...}} becomes a
+    'user.email' column and lists of related objects become ';'-separated ids.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(self.stream(rows)).encode(self.charset)
+
+    def stream(self, rows):
+        writer = csv.writer(_Echo())
+        header = None
+        for row in rows:
+            flat = self.flatten(row)
+            if header is None:
+                header = list(flat)
+                yield writer.writerow(header)
+            yield writer.writerow([flat.get(column, '') for column in header])
+
+    def flatten(self, data, prefix=''):
+        flat = {}
+        for key, value in data.items():
+            column = f'{prefix}{key}'
+            if isinstance(value, dict):
+                flat.update(self.flatten(value, prefix=f'{column}.'))
+            elif isinstance(value, list):
+                flat[column] = ';'.join(str(item['id'] if isinstance(item, dict) else item) for item in value)
+            elif value is None:
+                flat[column] = ''
+            else:
+                flat[column] = value
+        return flat
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, str):
+            # Error details
+            data = json.dumps(data, cls=JSONEncoder, ensure_ascii=False)
+        return data.encode(self.charset)
@@ -0,0 +1,110 @@
+from datetime import datetime
+
+from django.db import transaction
+
+from .models import SubscriptionModel, ClientProfileModel
+from .versions import touch
+from .utils import chunks
+from . import generations
+
+RENEWED = 'renewed'
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+ACTIVE = 'active'
+
+
+def renew_subscriptions(renewals, renewed_at=None, batch_size=1000):
+    """
+    Renew subscriptions from `renewals`, a list of {'id': ..., 'month': ...}
+    dicts where month is optional. Each renewed subscription starts again on
+    `renewed_at` (today by default) and its client profile's expires_on is
+    recomputed. Runs in one transaction with two bulk updates per batch and
+    returns one {'id', 'status'} result per row. Renewing twice with the same
+    arguments reports the rows as unchanged.
+    """
+    renewed_at = renewed_at or datetime.now().date()
+    month_choices = dict(SubscriptionModel.MONTHS_LIMITATIONS)
+    results = []
+
+    with transaction.atomic():
+        for chunk in chunks(renewals, batch_size):
+            ids = [item['id'] for item in chunk]
+            subscriptions = SubscriptionModel.objects.in_bulk(ids)
+            profiles = {profile.subscription_id: profile
+                        for profile in ClientProfileModel.objects.select_related('user')
+                                                                 .filter(subscription_id__in=ids)}
+            changed_subscriptions = []
+            changed_profiles = []
+
+            for item in chunk:
+                subscription = subscriptions.get(item['id'])
+                if subscription is None:
+                    results.append({'id': item['id'], 'status': NOT_FOUND})
+                    continue
+                month = item.get('month') or subscription.month
+                if month not in month_choices:
+                    results.append({'id': item['id'], 'status': INVALID,
+                                    'error': 'Month must be: [1, 6, 12].'})
+                    continue
+                if subscription.month == month and subscription.updated_at == renewed_at:
+                    results.append({'id': item['id'], 'status': UNCHANGED})
+                    continue
+
+                subscription.month = month
+                subscription.updated_at = renewed_at
+                changed_subscriptions.append(subscription)
+
+                profile = profiles.get(subscription.pk)
+                if profile is not None:
+                    profile.subscription = subscription
+                    profile.expires_on = profile.get_expires_on()
+                    changed_profiles.append(profile)
+                results.append({'id': item['id'], 'status': RENEWED})
+
+            SubscriptionModel.objects.bulk_update(changed_subscriptions, ['month', 'updated_at'])
+            ClientProfileModel.objects.bulk_update(changed_profiles, ['expires_on'])
+            touch(ClientProfileModel.objects.filter(pk__in=[profile.pk for profile in changed_profiles]))
+        # bulk_update sends no post_save.
+        generations.bump(generations.SUBSCRIPTIONS, generations.CLIENT_PROFILES)
+
+    return results
+
+
+def sweep_subscriptions(today=None, batch_size=1000):
+    """
+    Recompute expires_on for every client profile, write back the rows that
+    drifted (e.g. edited through the admin or raw SQL) and report whether
+    each subscription is expired as of `today`.
+    """
+    today = today or datetime.now().date()
+    results = []
+    last_pk = 0
+
+    with transaction.atomic():
+        while True:
+            profiles = list(ClientProfileModel.objects.select_related('user', 'subscription')
+                                                      .filter(pk__gt=last_pk)
+                                                      .order_by('pk')[:batch_size])
+            if not profiles:
+                break
+            last_pk = profiles[-1].pk
+
+            changed_profiles = []
+            for profile in profiles:
+                expires_on = profile.get_expires_on()
+                corrected = profile.expires_on != expires_on
+                if corrected:
+                    profile.expires_on = expires_on
+                    changed_profiles.append(profile)
+                results.append({'id': profile.subscription_id,
+                                'status': EXPIRED if expires_on <= today else ACTIVE,
+                                'expires_on': expires_on,
+                                'corrected': corrected})
+
+            ClientProfileModel.objects.bulk_update(changed_profiles, ['expires_on'])
+            touch(ClientProfileModel.objects.filter(pk__in=[profile.pk for profile in changed_profiles]))
+        generations.bump(generations.CLIENT_PROFILES)
+
+    return results
@@ -0,0 +1,123 @@
+"""
+Read-only representations of client and staff profiles for list and
+retrieve. They produce the same JSON as ClientProfileSerializer and
+StaffProfileSerializer, built straight from values() rows instead of
+model instances and DRF fields.
+"""
+from abc import ABC, abstractmethod
+
+from .models import ClientProfileModel, StaffProfileModel, UserModel, ServiceModel
+from .serializers import UserModelSerializer, SubscriptionModelSerializer, service_cache, position_cache
+
+USER_FIELDS = UserModelSerializer.Meta.fields
+SUBSCRIPTION_FIELDS = SubscriptionModelSerializer.Meta.fields
+# Fields rendered by DRF's DateField as ISO strings.
+DATE_FIELDS = {'created_at', 'updated_at'}
+
+
+def _format(name, value):
+    if name in DATE_FIELDS and value is not None:
+        return value.isoformat()
+    return value
+
+
+def _nested(row, prefix, fields):
+    return {name: _format(name, row[f'{prefix}__{name}']) for name in fields}
+
+
+def _nested_from_instance(instance, fields):
+    return {name: _format(name, getattr(instance, name)) for name in fields}
+
+
+class ProfileRepresentation(ABC):
+    model = None
+    # Columns of the profile row, as values() paths.
+    row_fields = ()
+
+    def values(self, queryset):
+        """The queryset as rows for from_rows; annotations such as search_rank are kept."""
+        return queryset.values(*self.row_fields, *queryset.query.annotations)
+
+    def from_rows(self, rows):
+        rows = list(rows)
+        context = self.get_context(rows)
+        return [self.build(row, context) for row in rows]
+
+    @abstractmethod
+    def get_context(self, rows):
+        """Related data of the whole page, loaded once for build()."""
+
+    @abstractmethod
+    def build(self, row, context):
+        """The JSON of one row."""
+
+
+class ClientProfileRepresentation(ProfileRepresentation):
+    model = ClientProfileModel
+    row_fields = (('id',)
+                  + tuple(f'user__{name}' for name in USER_FIELDS)
+                  + tuple(f'subscription__{name}' for name in SUBSCRIPTION_FIELDS))
+
+    def get_context(self, rows):
+        # Same order as the services prefetch of ClientProfileQueryPlan.
+        pairs = list(ServiceModel.objects.filter(clientprofilemodel__in=[row['id'] for row in rows])
+                     .order_by('pk').values_list('clientprofilemodel', 'id'))
+        services = service_cache.get_many({service_id for _, service_id in pairs})
+        related = {}
+        for profile_id, service_id in pairs:
+            related.setdefault(profile_id, []).append(services[service_id])
+        return related
+
+    def build(self, row, services):
+        return {
+            'id': row['id'],
+            'user': _nested(row, 'user', USER_FIELDS),
+            'subscription': _nested(row, 'subscription', SUBSCRIPTION_FIELDS),
+            'services': services.get(row['id'], []),
+        }
+
+    def from_instance(self, instance):
+        """For a profile loaded with ClientProfileQueryPlan."""
+        service_ids = [service.pk for service in instance.services.all()]
+        services = service_cache.get_many(service_ids)
+        return {
+            'id': instance.pk,
+            'user': _nested_from_instance(instance.user, USER_FIELDS),
+            'subscription': _nested_from_instance(instance.subscription, SUBSCRIPTION_FIELDS),
+            'services': [services[pk] for pk in service_ids],
+        }
+
+
+class StaffProfileRepresentation(ProfileRepresentation):
+    model = StaffProfileModel
+    row_fields = (('id', 'position_id')
+                  + tuple(f'user__{name}' for name in USER_FIELDS))
+
+    def get_context(self, rows):
+        positions = position_cache.get_many({row['position_id'] for row in rows})
+        # Same order as the clients prefetch of StaffProfileQueryPlan.
+        clients = {}
+        for staff_id, *values in (UserModel.objects.filter(clients__in=[row['id'] for row in rows])
+                                  .order_by('pk').values_list('clients', *USER_FIELDS)):
+            clients.setdefault(staff_id, []).append(
+                {name: _format(name, value) for name, value in zip(USER_FIELDS, values)})
+        return positions, clients
+
+    def build(self, row, context):
+        positions, clients = context
+        return {
+            'id': row['id'],
+            'user': _nested(row, 'user', USER_FIELDS),
+            'position': positions[row['position_id']],
+            'clients': clients.get(row['id'], []),
+        }
+
+    def from_instance(self, instance):
+        """For a profile loaded with StaffProfileQueryPlan."""
+        positions = position_cache.get_many([instance.position_id])
+        return {
+            'id': instance.pk,
+            'user': _nested_from_instance(instance.user, USER_FIELDS),
+            'position': positions[instance.position_id],
+            'clients': [_nested_from_instance(client, USER_FIELDS) for client in instance.clients.all()],
+        }
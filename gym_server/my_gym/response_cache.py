@@ -0,0 +1,130 @@
+"""
+Cached list responses. Entries are keyed by the request's normalized query,
+the caller's permission class and the generations of the tables the view
+reads (my_gym.generations), so writes never have to find the entries they
+invalidate. A cold key is computed once: concurrent requests for it wait
+for the first one, in this process on an event and in other processes on a
+lease held in the cache.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .generations import get_generations
+
+
+def normalize_query(query_params):
+    # Pagination links are rebuilt with sorted parameters, so parameter
+    # order never changes a response; the order of repeated values may.
+    return tuple((name, tuple(values)) for name, values in sorted(query_params.lists()))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.failed = False
+        self.result = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers get its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            # The leader failed or is stuck: compute it ourselves.
+            if not call.done.wait(timeout) or call.failed:
+                return function()
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException:
+            call.failed = True
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class ResponseCache:
+    poll_interval = 0.01
+
+    def __init__(self):
+        self.flight = SingleFlight()
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'REFERENCE_CACHE_ALIAS', 'default')]
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'RESPONSE_CACHE', True)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 60)
+
+    @property
+    def lease_timeout(self):
+        return getattr(settings, 'RESPONSE_CACHE_LEASE', 10)
+
+    def make_key(self, name, request, scope, dependencies, variant=()):
+        """A digest of everything the response depends on; also used as its ETag."""
+        parts = (name, request.scheme, request.get_host(), request.path,
+                 normalize_query(request.query_params), scope,
+                 tuple(dependencies), get_generations(*dependencies), variant)
+        return hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+
+    def get_or_compute(self, key, compute):
+        if not self.enabled:
+            return compute()
+        data = self.cache.get(self._key(key))
+        if data is None:
+            data = self.flight.do(key, lambda: self._fill(key, compute), self.lease_timeout)
+        return data
+
+    def _fill(self, key, compute):
+        lease = self._key(key, 'lease')
+        owner = self.cache.add(lease, True, self.lease_timeout)
+        if not owner:
+            data = self._wait(key, lease)
+            if data is not None:
+                return data
+        try:
+            data = compute()
+            self.cache.set(self._key(key), data, self.timeout)
+        finally:
+            if owner:
+                self.cache.delete(lease)
+        return data
+
+    def _wait(self, key, lease):
+        deadline = time.monotonic() + self.lease_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            data = self.cache.get(self._key(key))
+            if data is not None or self.cache.get(lease) is None:
+                return data
+        return None
+
+    @staticmethod
+    def _key(*parts):
+        return ':'.join(('response',) + parts)
+
+
+response_cache = ResponseCache()
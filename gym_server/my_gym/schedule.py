@@ -0,0 +1,86 @@
+"""
+Interval queries over the service schedule. A slot covers
+[time_start, time_end); a slot whose end is earlier than its start runs
+past midnight.
+
+Interval conditions alone cannot use a B-tree index, so each query is
+narrowed to a time_start range with the length of the longest slot: a
+slot running at 18:30 must start between 18:30 minus that length and
+18:30, and overnight slots all start within that length of midnight. The
+(time_start, time_end) index serves those ranges. The longest slot length
+is cached under the service cache version.
+"""
+from datetime import time
+
+from django.db.models import F, Q
+
+from .models import ServiceModel
+
+DAY = 24 * 60 * 60
+
+
+def to_seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second + (1 if value.microsecond else 0)
+
+
+def from_seconds(seconds):
+    seconds = min(max(seconds, 0), DAY - 1)
+    return time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def get_slot_length(start, end):
+    return (to_seconds(end) - to_seconds(start)) % DAY
+
+
+def get_longest_slot():
+    """Length in seconds of the longest service slot, cached per service cache version."""
+    from .serializers import service_cache
+
+    return service_cache.get_derived('longest_slot', lambda: max(
+        (get_slot_length(start, end) + 1 for start, end in ServiceModel.objects.values_list('time_start', 'time_end')),
+        default=0))
+
+
+def _same_day(start_from=None):
+    condition = Q(time_start__lt=F('time_end'))
+    if start_from is not None:
+        condition &= Q(time_start__gte=from_seconds(start_from))
+    return condition
+
+
+def _overnight(longest=None):
+    condition = Q(time_start__gt=F('time_end'))
+    if longest is not None:
+        condition &= Q(time_start__gte=from_seconds(DAY - longest))
+    return condition
+
+
+def slots_running_at(moment, longest=None):
+    """
+    Q for services whose slot contains `moment`. `longest` bounds the slot
+    length in seconds; without it the query scans the whole table.
+    """
+    same_day = (_same_day(None if longest is None else to_seconds(moment) - longest)
+                & Q(time_start__lte=moment, time_end__gt=moment))
+    overnight = _overnight(longest) & (Q(time_start__lte=moment) | Q(time_end__gt=moment))
+    return same_day | overnight
+
+
+def slots_overlapping(start, end, longest=None):
+    """
+    Q for services whose slot overlaps [start, end), which may itself run
+    past midnight. `longest` is as for slots_running_at.
+    """
+    pieces = [(start, end)] if start < end else [(start, None), (time.min, end)]
+    condition = Q(pk__in=[])
+    for piece_start, piece_end in pieces:
+        same_day = (_same_day(None if longest is None else to_seconds(piece_start) - longest)
+                    & Q(time_end__gt=piece_start))
+        if piece_end is None:
+            # The piece runs to midnight, as does every overnight slot.
+            overnight = _overnight(longest)
+        else:
+            same_day &= Q(time_start__lt=piece_end)
+            overnight = _overnight(longest) & (Q(time_start__lt=piece_end) | Q(time_end__gt=piece_start))
+        condition |= same_day | overnight
+    return condition
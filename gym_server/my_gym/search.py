@@ -0,0 +1,162 @@
+from django.db import connection
+from django.db.models import Case, FloatField, OuterRef, Q, Subquery, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import ClientProfileModel, StaffProfileModel, SearchDocumentModel
+from .utils import CHUNK_SIZE, chunks
+
+SEARCH_INDEX_TABLE = 'my_gym_searchindex'
+MAX_TERMS = 8
+# FTS5 table present, per database alias.
+_fts_index = {}
+
+SEARCH_KINDS = {
+    ClientProfileModel: SearchDocumentModel.CLIENT,
+    StaffProfileModel: SearchDocumentModel.STAFF,
+}
+
+
+def get_terms(query):
+    return query.split()[:MAX_TERMS]
+
+
+def _document(kind, pk, first_name, last_name, email, tags):
+    name = f'{first_name} {last_name}'
+    return SearchDocumentModel(kind=kind, object_id=pk, name=name, email=email, tags=tags,
+                               document=' '.join((name, email, tags)).lower())
+
+
+def build_client_documents(ids):
+    through = ClientProfileModel.services.through
+    services = {}
+    for profile_id, service_name in (through.objects
+                                     .filter(clientprofilemodel_id__in=ids)
+                                     .order_by('servicemodel_id')
+                                     .values_list('clientprofilemodel_id', 'servicemodel__name')):
+        services.setdefault(profile_id, []).append(service_name)
+
+    rows = (ClientProfileModel.objects.filter(pk__in=ids)
+            .values_list('pk', 'user__first_name', 'user__last_name', 'user__email'))
+    return [_document(SearchDocumentModel.CLIENT, pk, first_name, last_name, email,
+                      ' '.join(services.get(pk, ())))
+            for pk, first_name, last_name, email in rows]
+
+
+def build_staff_documents(ids):
+    rows = (StaffProfileModel.objects.filter(pk__in=ids)
+            .values_list('pk', 'user__first_name', 'user__last_name', 'user__email', 'position__name'))
+    return [_document(SearchDocumentModel.STAFF, pk, first_name, last_name, email, position_name)
+            for pk, first_name, last_name, email, position_name in rows]
+
+
+DOCUMENT_BUILDERS = {
+    SearchDocumentModel.CLIENT: build_client_documents,
+    SearchDocumentModel.STAFF: build_staff_documents,
+}
+
+
+def index_profiles(kind, ids):
+    """(Re)build the search documents of the given client or staff profiles."""
+    for chunk in chunks(list(ids), CHUNK_SIZE):
+        SearchDocumentModel.objects.filter(kind=kind, object_id__in=chunk).delete()
+        SearchDocumentModel.objects.bulk_create(DOCUMENT_BUILDERS[kind](chunk))
+
+
+def remove_profiles(kind, ids):
+    for chunk in chunks(list(ids), CHUNK_SIZE):
+        SearchDocumentModel.objects.filter(kind=kind, object_id__in=chunk).delete()
+
+
+def rebuild_index():
+    SearchDocumentModel.objects.all().delete()
+    for model, kind in SEARCH_KINDS.items():
+        index_profiles(kind, model.objects.order_by('pk').values_list('pk', flat=True))
+
+
+class DatabaseSearchBackend:
+    """
+    Substring search with icontains on the document table, ranked in
+    tiers: exact email, then a name word or the email starting with the
+    query, then anything else.
+    """
+
+    def documents(self, kind):
+        return SearchDocumentModel.objects.filter(kind=kind)
+
+    def matching_ids(self, kind, query, column='document'):
+        documents = self.documents(kind)
+        for term in get_terms(query):
+            documents = documents.filter(**{f'{column}__icontains': term})
+        return documents.values('object_id')
+
+    def rank(self, kind, query):
+        query = query.strip()
+        ranked = self.documents(kind).filter(object_id=OuterRef('pk')).annotate(
+            search_rank=Case(When(email__iexact=query, then=Value(3.0)),
+                             When(Q(name__istartswith=query) | Q(name__icontains=f' {query}')
+                                  | Q(email__istartswith=query), then=Value(2.0)),
+                             default=Value(1.0),
+                             output_field=FloatField()))
+        return Subquery(ranked.values('search_rank')[:1], output_field=FloatField())
+
+
+class PostgresTrigramSearchBackend(DatabaseSearchBackend):
+    """icontains is served by the pg_trgm GIN index; ranks by trigram similarity."""
+
+    def rank(self, kind, query):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        ranked = (self.documents(kind).filter(object_id=OuterRef('pk'))
+                  .annotate(search_rank=TrigramSimilarity('document', query.strip().lower())))
+        return Subquery(ranked.values('search_rank')[:1], output_field=FloatField())
+
+
+class SQLiteFTSSearchBackend(DatabaseSearchBackend):
+    """
+    Matches through the FTS5 trigram table; terms shorter than three
+    characters cannot be matched by the trigram tokenizer, so those
+    queries fall back to icontains. Ranking stays on the relevance tiers:
+    bm25 can only be computed inside the MATCH query, and evaluating it
+    once per matching profile costs seconds on large tables.
+    """
+
+    @staticmethod
+    def get_match(query, column=None):
+        match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in get_terms(query))
+        return f'{column} : ({match})' if column else match
+
+    @staticmethod
+    def is_indexable(query):
+        terms = get_terms(query)
+        return bool(terms) and all(len(term) >= 3 for term in terms)
+
+    def matching_ids(self, kind, query, column='document'):
+        if not self.is_indexable(query):
+            return super().matching_ids(kind, query, column)
+        match = self.get_match(query, None if column == 'document' else column)
+        return (self.documents(kind)
+                .filter(id__in=RawSQL(f'SELECT rowid FROM {SEARCH_INDEX_TABLE} '
+                                      f'WHERE {SEARCH_INDEX_TABLE} MATCH %s', [match]))
+                .values('object_id'))
+
+
+def _has_fts_index():
+    # Migration 0011 skips the FTS5 table when SQLite lacks the trigram
+    # tokenizer (before 3.34). Probed once per database, as connections
+    # do not outlive a request by default.
+    has_index = _fts_index.get(connection.alias)
+    if has_index is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                           [SEARCH_INDEX_TABLE])
+            has_index = cursor.fetchone() is not None
+        _fts_index[connection.alias] = has_index
+    return has_index
+
+
+def get_search_backend():
+    if connection.vendor == 'sqlite' and _has_fts_index():
+        return SQLiteFTSSearchBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresTrigramSearchBackend()
+    return DatabaseSearchBackend()
@@ -2,7 +2,8 @@ from rest_framework import serializers
 from rest_framework.utils import model_meta
 
 from my_gym.models import *
-from .utils import check_user_data, check_subscription_data
+from .reference_cache import ReferenceDataCache
+from .utils import check_user_data, check_subscription_data, to_model_values, sync_m2m, is_same_value
 
 
 class UserModelSerializer(serializers.ModelSerializer):
@@ -18,6 +19,16 @@ class SubscriptionModelSerializer(serializers.ModelSerializer):
         fields = ('id', 'month', 'updated_at')
 
 
+class SubscriptionRenewalItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    month = serializers.ChoiceField(choices=SubscriptionModel.MONTHS_LIMITATIONS, required=False)
+
+
+class SubscriptionRenewalSerializer(serializers.Serializer):
+    renewed_at = serializers.DateField(required=False)
+    subscriptions = SubscriptionRenewalItemSerializer(many=True, allow_empty=False)
+
+
 class ServiceModelSerializer(serializers.ModelSerializer):
     class Meta:
         model = ServiceModel
@@ -30,26 +41,81 @@ class PositionModelSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'duty')
 
 
+class IdListField(serializers.ListField):
+    """A list of primary keys, also accepted as a ';' separated string (CSV cells)."""
+    child = serializers.IntegerField(min_value=1)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = [item for item in data.split(';') if item.strip()]
+        return super().to_internal_value(data)
+
+
+class MemberOnboardingSerializer(serializers.Serializer):
+    first_name = serializers.CharField(max_length=25)
+    last_name = serializers.CharField(max_length=25)
+    email = serializers.EmailField(max_length=254)
+    password = serializers.CharField(max_length=128, min_length=8)
+
+    def validate_first_name(self, value):
+        if value.isdigit():
+            raise serializers.ValidationError('First name could not be an integer.')
+        return value
+
+    def validate_last_name(self, value):
+        if value.isdigit():
+            raise serializers.ValidationError('Last name could not be an integer.')
+        return value
+
+    def validate_email(self, value):
+        return UserModel.objects.normalize_email(value)
+
+
+class ClientOnboardingSerializer(MemberOnboardingSerializer):
+    month = serializers.ChoiceField(choices=SubscriptionModel.MONTHS_LIMITATIONS, required=False)
+    updated_at = serializers.DateField(required=False)
+    services = IdListField(required=False)
+
+
+class StaffOnboardingSerializer(MemberOnboardingSerializer):
+    position = serializers.IntegerField(min_value=1)
+    clients = IdListField(required=False)
+
+
+service_cache = ReferenceDataCache('services', ServiceModel, ServiceModelSerializer)
+position_cache = ReferenceDataCache('positions', PositionModel, PositionModelSerializer)
+
+
 class CustomForeignKeyField(serializers.PrimaryKeyRelatedField):
 
     def __init__(self, **kwargs):
         self.model = kwargs.pop('model', None)
         self.serializer = kwargs.pop('serializer', None)
         self.pk_field = kwargs.pop('pk_field', None)
+        self.reference_cache = kwargs.pop('reference_cache', None)
         super().__init__(**kwargs)
 
     def get_queryset(self):
         return self.queryset
 
+    def use_pk_only_optimization(self):
+        # Related objects are serialized in full, so take them from the
+        # select_related/prefetch_related cache instead of a bare pk,
+        # unless the reference data cache can serve them by pk.
+        return self.reference_cache is not None
+
     def to_representation(self, value):
-        value = super().to_representation(value)
-        model_object = self.model.objects.get(pk=value)
-        return self.serializer(model_object).data
+        if self.reference_cache is not None:
+            data = self.reference_cache.get(value.pk)
+            if data is not None:
+                return data
+        if not isinstance(value, self.model):
+            value = self.model.objects.get(pk=super().to_representation(value))
+        return self.serializer(value).data
 
 
 class CustomListFiled(serializers.ListField):
     def to_representation(self, data):
-        print(data)
         return [self.child.to_representation(item) if item is not None else None for item in data]
 
 
@@ -64,6 +130,7 @@ class ClientProfileSerializer(serializers.ModelSerializer):
     services = CustomForeignKeyField(model=ServiceModel,
                                      serializer=ServiceModelSerializer,
                                      queryset=ServiceModel.objects.all(),
+                                     reference_cache=service_cache,
                                      many=True)
     updated_data = serializers.DictField(required=False)
     subscription_data = serializers.DictField(required=False)
@@ -72,7 +139,6 @@ class ClientProfileSerializer(serializers.ModelSerializer):
         model = ClientProfileModel
         fields = ('id', 'user', 'subscription', 'services', 'updated_data', 'subscription_data')
 
-
     def create(self, validated_data):
         user = validated_data.get('user', None)
         subscription_data = validated_data.get('subscription_data', None)
@@ -87,10 +153,11 @@ class ClientProfileSerializer(serializers.ModelSerializer):
         if subscription_data is None:
             subscription = SubscriptionModel.objects.create()
         else:
-            subscription = SubscriptionModel.objects.create(**subscription_data)
-        client_profile = ClientProfileModel.objects.create(user=user, subscription=subscription)
-        for service in services:
-            client_profile.services.add(service)
+            subscription = SubscriptionModel.objects.create(**to_model_values(SubscriptionModel, subscription_data))
+        client_profile = ClientProfileModel(user=user, subscription=subscription)
+        client_profile.expires_on = client_profile.get_expires_on()
+        client_profile.save()
+        sync_m2m(client_profile, 'services', services or [], created=True)
 
         return client_profile
 
@@ -121,12 +188,18 @@ class ClientProfileSerializer(serializers.ModelSerializer):
 
             if subscription_data:
                 check_subscription_data(subscription_data)
-                for attr, value in subscription_data.items():
+                for attr, value in to_model_values(SubscriptionModel, subscription_data).items():
                     setattr(subscription, attr, value)
                 subscription.save()
             else:
                 subscription = subscription_data
 
+        changed_fields = []
+        expires_on = instance.get_expires_on()
+        if instance.expires_on != expires_on:
+            instance.expires_on = expires_on
+            changed_fields.append('expires_on')
+
         client_profile_data = {"user": user, "subscription": subscription, "services": services}
 
         m2m_fields = []
@@ -134,16 +207,16 @@ class ClientProfileSerializer(serializers.ModelSerializer):
             if attr in info.relations and info.relations[attr].to_many:
                 m2m_fields.append((attr, value))
             else:
-                if value:
+                if value and not is_same_value(instance, attr, value):
                     setattr(instance, attr, value)
+                    changed_fields.append(attr)
 
-        instance.save()
+        if changed_fields:
+            instance.save(update_fields=changed_fields)
 
         if services:
             for attr, value in m2m_fields:
-                field = getattr(instance, attr)
-
-                field.set(value)
+                sync_m2m(instance, attr, value)
 
         return instance
 
@@ -154,7 +227,8 @@ class StaffProfileSerializer(serializers.ModelSerializer):
                                  queryset=UserModel.objects.all())
     position = CustomForeignKeyField(model=PositionModel,
                                  serializer=PositionModelSerializer,
-                                 queryset=PositionModel.objects.all())
+                                 queryset=PositionModel.objects.all(),
+                                 reference_cache=position_cache)
     clients = CustomForeignKeyField(model=UserModel,
                                      serializer=UserModelSerializer,
                                      queryset=UserModel.objects.all(),
@@ -177,8 +251,7 @@ class StaffProfileSerializer(serializers.ModelSerializer):
             pass
 
         staff_profile = StaffProfileModel.objects.create(user=user, position=position)
-        for client in clients:
-             staff_profile.clients.add(client)
+        sync_m2m(staff_profile, 'clients', clients or [], created=True)
 
         return staff_profile
 
@@ -207,20 +280,21 @@ class StaffProfileSerializer(serializers.ModelSerializer):
 
         staff_profile_data = {"user": user, "position": position, "clients": clients}
 
+        changed_fields = []
         m2m_fields = []
         for attr, value in staff_profile_data.items():
             if attr in info.relations and info.relations[attr].to_many:
                 m2m_fields.append((attr, value))
             else:
-                if value:
-                    print(attr, value)
+                if value and not is_same_value(instance, attr, value):
                     setattr(instance, attr, value)
+                    changed_fields.append(attr)
 
-        instance.save()
+        if changed_fields:
+            instance.save(update_fields=changed_fields)
 
         if clients:
             for attr, value in m2m_fields:
-                field = getattr(instance, attr)
-                field.set(value)
+                sync_m2m(instance, attr, value)
 
         return instance
@@ -0,0 +1,249 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import (
+    UserModel, ServiceModel, PositionModel, ClientProfileModel, StaffProfileModel, StaffClientModel,
+    SubscriptionModel, SearchDocumentModel, ChangeLogModel
+)
+from . import generations
+from .instrumentation import install_query_recorder
+from .search import index_profiles, remove_profiles
+from .versions import touch
+from . import changelog
+from .serializers import UserModelSerializer, service_cache, position_cache
+from .token_cache import token_cache, remember_token_version
+
+
+@receiver(post_save, sender=UserModel)
+@receiver(post_delete, sender=UserModel)
+def invalidate_cached_tokens(sender, instance, **kwargs):
+    # Any change may touch is_active, role or is_superuser, which the
+    # cached snapshot carries.
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=UserModel)
+def revoke_stateless_tokens(sender, instance, **kwargs):
+    if getattr(settings, 'STATELESS_ACCESS_TOKENS', False):
+        remember_token_version(instance.pk, instance.token_version)
+
+
+@receiver(post_delete, sender=UserModel)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    if getattr(settings, 'STATELESS_ACCESS_TOKENS', False):
+        remember_token_version(instance.pk, instance.token_version + 1)
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def record_connection_queries(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+@receiver(post_save, sender=ServiceModel)
+@receiver(post_delete, sender=ServiceModel)
+def invalidate_service_cache(sender, **kwargs):
+    service_cache.bump()
+
+
+@receiver(post_save, sender=PositionModel)
+@receiver(post_delete, sender=PositionModel)
+def invalidate_position_cache(sender, **kwargs):
+    position_cache.bump()
+
+
+# Generations of cached list responses (my_gym.response_cache); services and
+# positions are bumped through their reference caches above.
+
+@receiver(post_save, sender=UserModel)
+@receiver(post_delete, sender=UserModel)
+def bump_user_generation(sender, **kwargs):
+    generations.bump(generations.USERS)
+
+
+@receiver(post_save, sender=ClientProfileModel)
+@receiver(post_delete, sender=ClientProfileModel)
+@receiver(m2m_changed, sender=ClientProfileModel.services.through)
+def bump_client_profile_generation(sender, action=None, **kwargs):
+    if action is None or action.startswith('post_'):
+        generations.bump(generations.CLIENT_PROFILES)
+
+
+@receiver(post_save, sender=StaffProfileModel)
+@receiver(post_delete, sender=StaffProfileModel)
+@receiver(post_save, sender=StaffClientModel)
+@receiver(post_delete, sender=StaffClientModel)
+@receiver(m2m_changed, sender=StaffClientModel)
+def bump_staff_profile_generation(sender, action=None, **kwargs):
+    if action is None or action.startswith('post_'):
+        generations.bump(generations.STAFF_PROFILES)
+
+
+@receiver(post_save, sender=SubscriptionModel)
+@receiver(post_delete, sender=SubscriptionModel)
+def bump_subscription_generation(sender, **kwargs):
+    generations.bump(generations.SUBSCRIPTIONS)
+
+
+# Search documents (my_gym.search)
+
+SEARCHED_USER_FIELDS = {'first_name', 'last_name', 'email'}
+
+
+@receiver(post_save, sender=UserModel)
+def reindex_user_profiles(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not SEARCHED_USER_FIELDS.intersection(update_fields)):
+        return
+    index_profiles(SearchDocumentModel.CLIENT,
+                   ClientProfileModel.objects.filter(user=instance).values_list('pk', flat=True))
+    index_profiles(SearchDocumentModel.STAFF,
+                   StaffProfileModel.objects.filter(user=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=ClientProfileModel)
+def index_client_profile(sender, instance, **kwargs):
+    index_profiles(SearchDocumentModel.CLIENT, [instance.pk])
+
+
+@receiver(post_save, sender=StaffProfileModel)
+def index_staff_profile(sender, instance, **kwargs):
+    index_profiles(SearchDocumentModel.STAFF, [instance.pk])
+
+
+@receiver(post_delete, sender=ClientProfileModel)
+def remove_client_profile(sender, instance, **kwargs):
+    remove_profiles(SearchDocumentModel.CLIENT, [instance.pk])
+
+
+@receiver(post_delete, sender=StaffProfileModel)
+def remove_staff_profile(sender, instance, **kwargs):
+    remove_profiles(SearchDocumentModel.STAFF, [instance.pk])
+
+
+@receiver(m2m_changed, sender=ClientProfileModel.services.through)
+def reindex_client_services(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        index_profiles(SearchDocumentModel.CLIENT, pk_set or [])
+    else:
+        index_profiles(SearchDocumentModel.CLIENT, [instance.pk])
+
+
+@receiver(post_save, sender=ServiceModel)
+def reindex_service_clients(sender, instance, created, **kwargs):
+    if not created:
+        index_profiles(SearchDocumentModel.CLIENT,
+                       instance.clientprofilemodel_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=ServiceModel)
+def collect_service_clients(sender, instance, **kwargs):
+    # The through rows are gone by post_delete.
+    instance._client_ids = list(instance.clientprofilemodel_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=ServiceModel)
+def reindex_deleted_service_clients(sender, instance, **kwargs):
+    index_profiles(SearchDocumentModel.CLIENT, getattr(instance, '_client_ids', []))
+
+
+@receiver(post_save, sender=PositionModel)
+def reindex_position_staff(sender, instance, created, **kwargs):
+    if not created:
+        index_profiles(SearchDocumentModel.STAFF,
+                       instance.staffprofilemodel_set.values_list('pk', flat=True))
+
+
+# Profile versions (my_gym.versions); profiles' own saves move theirs.
+
+VERSIONED_USER_FIELDS = set(UserModelSerializer.Meta.fields)
+
+
+@receiver(post_save, sender=UserModel)
+def touch_user_profiles(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not VERSIONED_USER_FIELDS.intersection(update_fields)):
+        return
+    touch(ClientProfileModel.objects.filter(user=instance))
+    touch(StaffProfileModel.objects.filter(user=instance))
+    # Staff profiles render their clients' users too.
+    touch(StaffProfileModel.objects.filter(clients=instance))
+
+
+@receiver(post_save, sender=SubscriptionModel)
+def touch_subscription_profiles(sender, instance, created, **kwargs):
+    if not created:
+        touch(ClientProfileModel.objects.filter(subscription=instance))
+
+
+@receiver(m2m_changed, sender=ClientProfileModel.services.through)
+def touch_client_services(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        touch(ClientProfileModel.objects.filter(pk__in=pk_set or []))
+    else:
+        touch(ClientProfileModel.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=ServiceModel)
+def touch_service_clients(sender, instance, created, **kwargs):
+    if not created:
+        touch(ClientProfileModel.objects.filter(services=instance))
+
+
+@receiver(pre_delete, sender=ServiceModel)
+def touch_deleted_service_clients(sender, instance, **kwargs):
+    # Before the through rows go, so the clients are found by a join.
+    touch(ClientProfileModel.objects.filter(services=instance))
+
+
+@receiver(post_save, sender=PositionModel)
+def touch_position_staff(sender, instance, created, **kwargs):
+    if not created:
+        touch(StaffProfileModel.objects.filter(position=instance))
+
+
+@receiver(post_save, sender=StaffClientModel)
+@receiver(post_delete, sender=StaffClientModel)
+def touch_staff_client_link(sender, instance, **kwargs):
+    touch(StaffProfileModel.objects.filter(pk=instance.staff_id))
+
+
+@receiver(m2m_changed, sender=StaffClientModel)
+def touch_staff_clients(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        touch(StaffProfileModel.objects.filter(pk__in=pk_set or []))
+    else:
+        touch(StaffProfileModel.objects.filter(pk=instance.pk))
+
+
+# Change log of the sync feed (my_gym.changelog); touch() logs the profiles
+# it bumps.
+
+@receiver(post_save, sender=ClientProfileModel)
+@receiver(post_save, sender=StaffProfileModel)
+@receiver(post_save, sender=ServiceModel)
+@receiver(post_save, sender=PositionModel)
+def log_saved_entity(sender, instance, **kwargs):
+    changelog.record(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=ClientProfileModel)
+@receiver(post_delete, sender=StaffProfileModel)
+@receiver(post_delete, sender=ServiceModel)
+@receiver(post_delete, sender=PositionModel)
+def log_deleted_entity(sender, instance, **kwargs):
+    changelog.record(sender, [instance.pk], action=ChangeLogModel.DELETE)
@@ -0,0 +1,98 @@
+"""
+Member dashboard aggregates. Every breakdown is one GROUP BY query with
+conditional counts, so the cost does not depend on serializing profiles.
+Unfiltered stats can be materialized once a day into
+MemberStatsSnapshotModel (`manage.py stats_snapshot`).
+"""
+from datetime import datetime
+
+from django.db.models import Count, Q
+
+from .models import ClientProfileModel, StaffClientModel, StaffProfileModel, MemberStatsSnapshotModel
+
+
+def get_client_totals(clients, today):
+    totals = clients.aggregate(total=Count('id'),
+                               expired=Count('id', filter=Q(expires_on__lte=today)))
+    totals['active'] = totals['total'] - totals['expired']
+    return totals
+
+
+def get_subscription_stats(clients, today):
+    rows = (clients.order_by('subscription__month')
+            .values('subscription__month')
+            .annotate(clients=Count('id'), expired=Count('id', filter=Q(expires_on__lte=today))))
+    return [{'month': row['subscription__month'], 'clients': row['clients'], 'expired': row['expired']}
+            for row in rows]
+
+
+def get_service_stats(clients, today, filtered=False):
+    through = ClientProfileModel.services.through
+    rows = through.objects.all()
+    if filtered:
+        rows = rows.filter(clientprofilemodel_id__in=clients.values('pk'))
+    rows = (rows.order_by('servicemodel_id')
+            .values('servicemodel_id', 'servicemodel__name')
+            .annotate(clients=Count('clientprofilemodel_id'),
+                      expired=Count('clientprofilemodel_id',
+                                    filter=Q(clientprofilemodel__expires_on__lte=today))))
+    return [{'id': row['servicemodel_id'], 'name': row['servicemodel__name'],
+             'clients': row['clients'], 'expired': row['expired']}
+            for row in rows]
+
+
+def get_trainer_stats(clients, staff, today, filtered_clients=False, filtered_staff=False):
+    # Trainers serve client users; a client counts as expired when one of
+    # their client profiles in `clients` is.
+    rows = StaffClientModel.objects.all()
+    expired = Q(client__clientprofilemodel__expires_on__lte=today)
+    if filtered_clients:
+        rows = rows.filter(client_id__in=clients.values('user_id'))
+        expired &= Q(client__clientprofilemodel__pk__in=clients.values('pk'))
+    if filtered_staff:
+        rows = rows.filter(staff_id__in=staff.values('pk'))
+    rows = (rows.order_by('staff_id')
+            .values('staff_id', 'staff__user_id')
+            .annotate(clients=Count('client_id', distinct=True),
+                      expired=Count('client_id', distinct=True, filter=expired)))
+    return [{'id': row['staff_id'], 'user_id': row['staff__user_id'],
+             'clients': row['clients'], 'expired': row['expired']}
+            for row in rows]
+
+
+def _narrow(queryset, model):
+    # Filtered querysets may carry joins and annotations (search rank), so
+    # aggregates run over a pk semi-join instead.
+    if queryset is None or not queryset.query.has_filters():
+        return model.objects.all(), False
+    return model.objects.filter(pk__in=queryset.values('pk')), True
+
+
+def get_member_stats(clients=None, staff=None, today=None):
+    """
+    Dashboard stats for the client profiles in `clients` and the staff
+    profiles in `staff`, both default to every profile. A profile is
+    expired on `today` (default: the current date) as in
+    ClientProfileModel.is_expired.
+    """
+    today = today or datetime.now().date()
+    clients, filtered_clients = _narrow(clients, ClientProfileModel)
+    staff, filtered_staff = _narrow(staff, StaffProfileModel)
+    return {
+        'date': today.isoformat(),
+        'clients': get_client_totals(clients, today),
+        'subscriptions': get_subscription_stats(clients, today),
+        'services': get_service_stats(clients, today, filtered_clients),
+        'trainers': get_trainer_stats(clients, staff, today, filtered_clients, filtered_staff),
+    }
+
+
+def take_snapshot(today=None):
+    today = today or datetime.now().date()
+    snapshot, _ = MemberStatsSnapshotModel.objects.update_or_create(
+        date=today, defaults={'data': get_member_stats(today=today)})
+    return snapshot
+
+
+def get_snapshot(today=None):
+    return MemberStatsSnapshotModel.objects.filter(date=today or datetime.now().date()).first()
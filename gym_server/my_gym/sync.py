@@ -0,0 +1,84 @@
+"""
+Batches of the /api/sync/ feed: the entities changed after a change log
+cursor, rendered as their list endpoints render them, and tombstones of
+the ones deleted since.
+"""
+from .changelog import get_horizon
+from .models import ChangeLogModel, ServiceModel, PositionModel
+from .representations import ClientProfileRepresentation, StaffProfileRepresentation
+from .serializers import ServiceModelSerializer, PositionModelSerializer
+
+# Payload keys per change log entity.
+KEYS = {
+    ChangeLogModel.CLIENT: 'clients',
+    ChangeLogModel.STAFF: 'staff',
+    ChangeLogModel.SERVICE: 'services',
+    ChangeLogModel.POSITION: 'positions',
+}
+
+
+class StaleCursor(Exception):
+    """The cursor is older than the compacted change log."""
+
+
+def _profiles(representation):
+    def build(ids):
+        rows = representation.values(representation.model.objects.filter(pk__in=ids).order_by('pk'))
+        return {data['id']: data for data in representation.from_rows(rows)}
+    return build
+
+
+def _reference_data(model, serializer_class):
+    def build(ids):
+        return {instance.pk: serializer_class(instance).data
+                for instance in model.objects.filter(pk__in=ids).order_by('pk')}
+    return build
+
+
+BUILDERS = {
+    ChangeLogModel.CLIENT: _profiles(ClientProfileRepresentation()),
+    ChangeLogModel.STAFF: _profiles(StaffProfileRepresentation()),
+    ChangeLogModel.SERVICE: _reference_data(ServiceModel, ServiceModelSerializer),
+    ChangeLogModel.POSITION: _reference_data(PositionModel, PositionModelSerializer),
+}
+
+
+def get_changes(since=0, limit=200, visible=None):
+    """
+    The changes logged after the `since` cursor, at most `limit` entries,
+    as {'cursor', 'has_more', 'changes', 'deleted'}. `visible` is a Q on
+    ChangeLogModel narrowing the entities the caller may see. A cursor of 0
+    reads the whole log; a non-zero one below the compaction horizon raises
+    StaleCursor.
+    """
+    if since and since < get_horizon():
+        raise StaleCursor(since)
+
+    entries = ChangeLogModel.objects.filter(id__gt=since)
+    if visible is not None:
+        entries = entries.filter(visible)
+    rows = list(entries.order_by('id').values_list('id', 'entity', 'object_id', 'action')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    latest = {}
+    for _, entity, object_id, action in rows:
+        latest[entity, object_id] = action
+
+    changes, deleted = {}, {}
+    for entity, key in KEYS.items():
+        upserted = sorted(object_id for (name, object_id), action in latest.items()
+                          if name == entity and action == ChangeLogModel.UPSERT)
+        objects = BUILDERS[entity](upserted) if upserted else {}
+        changes[key] = [objects[object_id] for object_id in upserted if object_id in objects]
+        # Rows deleted after their upsert was logged are tombstoned right away.
+        deleted[key] = sorted([object_id for (name, object_id), action in latest.items()
+                               if name == entity and action == ChangeLogModel.DELETE]
+                              + [object_id for object_id in upserted if object_id not in objects])
+
+    return {
+        'cursor': rows[-1][0] if rows else since,
+        'has_more': has_more,
+        'changes': changes,
+        'deleted': deleted,
+    }
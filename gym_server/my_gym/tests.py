@@ -0,0 +1,283 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from .models import (
+    UserModel, ServiceModel, PositionModel, SubscriptionModel, ClientProfileModel, StaffProfileModel, ChangeLogModel
+)
+from .backends import TokenAuth
+from .instrumentation import QueryBudgetExceeded
+from .onboarding import onboard_members
+from .serializers import service_cache
+from .stats import get_member_stats
+from .token_cache import TokenUser, token_cache
+
+PASSWORD = 'password123'
+
+
+def create_user(email, role):
+    return UserModel.objects.create('First', 'Last', email, role, password=PASSWORD)
+
+
+def create_admin(email='admin@example.com'):
+    return UserModel.objects.create_superuser('Admin', 'User', email, 0, PASSWORD)
+
+
+def auth(user):
+    return {'HTTP_AUTHORIZATION': f'Token {user.access_token}'}
+
+
+class GymDataMixin:
+    """Services, a position, an admin with a cached token, and add_profiles()."""
+
+    def setUp(self):
+        self.services = [ServiceModel.objects.create(name=f'Service {index}', time_start='10:00', time_end='11:00')
+                         for index in range(3)]
+        self.position = PositionModel.objects.create(name='Trainer', duty='Training')
+        self.admin = create_admin()
+        self.auth = auth(self.admin)
+        # Authenticates once, so later requests find the token cached.
+        self.client.get('/api/positions/', **self.auth)
+
+    def add_profiles(self, count):
+        """`count` clients with every service and `count` trainers of all clients."""
+        start = ClientProfileModel.objects.count()
+        for index in range(start, start + count):
+            user = create_user(f'client{index}@example.com', 1)
+            profile = ClientProfileModel.objects.create(user=user, subscription=SubscriptionModel.objects.create())
+            profile.services.set(self.services)
+        clients = list(UserModel.objects.filter(role=1))
+        for index in range(start, start + count):
+            staff = StaffProfileModel.objects.create(user=create_user(f'staff{index}@example.com', 2),
+                                                     position=self.position)
+            staff.clients.set(clients)
+
+    @staticmethod
+    def clear_caches():
+        # Response, reference data and generation entries.
+        caches[getattr(settings, 'REFERENCE_CACHE_ALIAS', 'default')].clear()
+
+
+class TokenAuthTest(TestCase):
+    def test_request_user_is_a_token_user_on_miss_and_hit(self):
+        user = create_user('member@example.com', 1)
+        token = user.access_token
+        token_cache.invalidate_user(user.pk)
+        for _ in range(2):
+            request_user, _ = TokenAuth().authenticate_credentials(token)
+            self.assertIsInstance(request_user, TokenUser)
+            self.assertEqual((request_user.pk, request_user.role), (user.pk, 1))
+
+
+class ProfileListQueriesTest(GymDataMixin, TestCase):
+    """A list page runs the same queries for one profile as for a full page."""
+    client_list_queries = 3
+    staff_list_queries = 3
+
+    def assert_list_queries(self, role, queries, count):
+        self.clear_caches()
+        with self.assertNumQueries(queries):
+            response = self.client.get(f'/api/users/?role={role}', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), count)
+        return results
+
+    def test_client_list(self):
+        self.add_profiles(1)
+        self.assert_list_queries(1, self.client_list_queries, 1)
+        self.add_profiles(20)
+        results = self.assert_list_queries(1, self.client_list_queries, 21)
+        self.assertTrue(all(len(profile['services']) == 3 for profile in results))
+
+    def test_staff_list(self):
+        self.add_profiles(1)
+        self.assert_list_queries(2, self.staff_list_queries, 1)
+        self.add_profiles(20)
+        results = self.assert_list_queries(2, self.staff_list_queries, 21)
+        self.assertTrue(all(profile['position']['name'] == 'Trainer' for profile in results))
+        self.assertEqual(len(results[-1]['clients']), 21)
+
+    @override_settings(RESPONSE_CACHE=False)
+    def test_list_without_response_cache(self):
+        self.add_profiles(1)
+        self.assert_list_queries(1, self.client_list_queries, 1)
+        # The page is read again; only the services come from a cache.
+        with self.assertNumQueries(self.client_list_queries - 1):
+            self.client.get('/api/users/?role=1', **self.auth)
+
+
+class NestedOrderTest(GymDataMixin, TestCase):
+    def test_list_and_retrieve_order_nested_rows_by_pk(self):
+        client = ClientProfileModel.objects.create(user=create_user('client@example.com', 1),
+                                                   subscription=SubscriptionModel.objects.create())
+        staff = StaffProfileModel.objects.create(user=create_user('staff@example.com', 2), position=self.position)
+        other = create_user('other@example.com', 1)
+        # Linked in reverse, so the join order differs from the pk order.
+        for service in reversed(self.services):
+            client.services.add(service)
+        for user in (other, client.user):
+            staff.clients.add(user)
+        for role, profile, key, expected in (
+                (1, client, 'services', [service.pk for service in self.services]),
+                (2, staff, 'clients', [client.user_id, other.pk])):
+            listed = self.client.get(f'/api/users/?role={role}', **self.auth).json()['results'][0]
+            retrieved = self.client.get(f'/api/users/{profile.pk}/?role={role}', **self.auth).json()
+            self.assertEqual([item['id'] for item in listed[key]], expected)
+            self.assertEqual([item['id'] for item in retrieved[key]], expected)
+
+
+class ReferenceDataCacheTest(GymDataMixin, TestCase):
+    def test_loads_only_missing_rows(self):
+        first, second, _ = [service.pk for service in self.services]
+        self.clear_caches()
+        with self.assertNumQueries(1):
+            self.assertEqual(list(service_cache.get_many([first])), [first])
+        with self.assertNumQueries(1) as queries:
+            self.assertEqual(service_cache.get_many([first, second])[second]['name'], 'Service 1')
+        self.assertIn(f'IN ({second})', queries.captured_queries[0]['sql'])
+        with self.assertNumQueries(0):
+            service_cache.get_many([first, second])
+
+
+class MemberStatsTest(GymDataMixin, TestCase):
+    def test_trainer_expired_counts_only_filtered_profiles(self):
+        today = date(2026, 1, 1)
+        user = create_user('client@example.com', 1)
+        expired, active = [ClientProfileModel.objects.create(user=user, subscription=SubscriptionModel.objects.create(),
+                                                              expires_on=expires_on)
+                           for expires_on in (date(2025, 1, 1), date(2027, 1, 1))]
+        staff = StaffProfileModel.objects.create(user=create_user('staff@example.com', 2), position=self.position)
+        staff.clients.add(user)
+        for profile, count in ((active, 0), (expired, 1)):
+            stats = get_member_stats(ClientProfileModel.objects.filter(pk=profile.pk), today=today)
+            self.assertEqual(stats['trainers'], [{'id': staff.pk, 'user_id': staff.user_id, 'clients': 1, 'expired': count}])
+        self.assertEqual(get_member_stats(today=today)['trainers'][0]['expired'], 1)
+
+
+class OnboardingTest(GymDataMixin, TestCase):
+    def test_results_point_at_the_created_rows(self):
+        rows = [{'first_name': 'New', 'last_name': f'Member{index}', 'email': f'new{index}@example.com',
+                 'password': PASSWORD, 'month': 6, 'services': [self.services[index].pk]}
+                for index in range(3)]
+        results = onboard_members(rows, 1)
+        self.assertEqual([result['status'] for result in results], ['created'] * 3)
+        for row, result in zip(rows, results):
+            profile = ClientProfileModel.objects.get(pk=result['id'])
+            self.assertEqual((profile.user_id, profile.user.email), (result['user_id'], row['email']))
+            self.assertEqual(profile.subscription.month, 6)
+            self.assertEqual(list(profile.services.values_list('pk', flat=True)), row['services'])
+
+
+class ProfileVersionTest(GymDataMixin, TestCase):
+    def get_versions(self):
+        return list(ClientProfileModel.objects.order_by('pk').values_list('version', flat=True))
+
+    def test_service_changes_move_client_versions(self):
+        self.add_profiles(3)
+        versions = self.get_versions()
+        service = self.services[0]
+        service.name = 'Renamed'
+        service.save()
+        self.assertEqual(self.get_versions(), [version + 1 for version in versions])
+        service.delete()
+        self.assertEqual(self.get_versions(), [version + 2 for version in versions])
+
+
+class KeysetPaginationTest(GymDataMixin, TestCase):
+    def get_ids(self, url):
+        self.clear_caches()
+        response = self.client.get(url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [profile['id'] for profile in data['results']], data['next'], data['previous']
+
+    def test_pages_follow_the_keyset_both_ways(self):
+        self.add_profiles(5)
+        expected = list(ClientProfileModel.objects.order_by('user__id', 'id').values_list('id', flat=True))
+        pages, url = [], '/api/users/?role=1&page_size=2'
+        while url:
+            ids, url, _ = self.get_ids(url)
+            pages.append(ids)
+        self.assertEqual(sum(pages, []), expected)
+
+        _, url, _ = self.get_ids('/api/users/?role=1&page_size=2')
+        _, _, previous = self.get_ids(url)
+        self.assertEqual(self.get_ids(previous)[0], pages[0])
+
+
+class SyncTest(GymDataMixin, TransactionTestCase):
+    """The change log is written on commit, so these tests really commit."""
+
+    def test_client_syncs_twice_with_one_token(self):
+        self.add_profiles(2)
+        profile = ClientProfileModel.objects.order_by('pk').first()
+        client_auth = auth(profile.user)
+        # The second request authenticates from the token cache.
+        for _ in range(2):
+            response = self.client.get('/api/sync/', **client_auth)
+            self.assertEqual(response.status_code, 200)
+            changes = response.json()['changes']
+            self.assertEqual([data['id'] for data in changes['clients']], [profile.pk])
+            self.assertEqual(len(changes['services']), 3)
+            self.assertEqual(changes['staff'], [])
+
+    def test_delete_logs_one_tombstone(self):
+        self.add_profiles(1)
+        for role, model, entity in ((1, ClientProfileModel, ChangeLogModel.CLIENT),
+                                    (2, StaffProfileModel, ChangeLogModel.STAFF)):
+            profile = model.objects.get()
+            response = self.client.delete(f'/api/users/{profile.pk}/?role={role}', **self.auth)
+            self.assertEqual(response.status_code, 204)
+            self.assertFalse(model.objects.exists())
+            tombstones = ChangeLogModel.objects.filter(entity=entity, object_id=profile.pk,
+                                                       action=ChangeLogModel.DELETE)
+            self.assertEqual(tombstones.count(), 1)
+
+
+@override_settings(QUERY_BUDGET_ACTION='raise')
+class QueryBudgetTest(GymDataMixin, TransactionTestCase):
+    """Every budgeted view stays within QUERY_BUDGETS with cold caches and a cold token."""
+
+    def setUp(self):
+        super().setUp()
+        self.add_profiles(5)
+        client = ClientProfileModel.objects.order_by('pk').first()
+        staff = StaffProfileModel.objects.order_by('pk').first()
+        self.requests = [
+            ('my_gym.views.UserViewSet.list', '/api/users/?role=1', {}),
+            ('my_gym.views.UserViewSet.list', '/api/users/?role=1&search=client&expired=false', {}),
+            ('my_gym.views.UserViewSet.list', '/api/users/?role=2', {}),
+            ('my_gym.views.UserViewSet.retrieve', f'/api/users/{client.pk}/?role=1', {}),
+            ('my_gym.views.UserViewSet.retrieve', f'/api/users/{client.pk}/?role=1',
+             {'HTTP_IF_NONE_MATCH': '"stale"'}),
+            ('my_gym.views.UserViewSet.retrieve', f'/api/users/{staff.pk}/?role=2', {}),
+            ('my_gym.views.UserViewSet.stats', '/api/users/stats/?role=1', {}),
+            ('my_gym.views.UserViewSet.stats', '/api/users/stats/?role=2&created_gt=2000-01-01', {}),
+            ('my_gym.views.UserViewSet.trainers', f'/api/users/trainers/?role=2&clients={client.user_id}', {}),
+            ('my_gym.views.ServiceViewSet.list', '/api/services/', {}),
+            ('my_gym.views.PositionViewSet.list', '/api/positions/', {}),
+            ('my_gym.views.SubscriptionListView.list', '/api/subscriptions/', {}),
+            ('my_gym.views.SyncView.get', '/api/sync/', {}),
+        ]
+
+    def cold_get(self, url, **extra):
+        self.clear_caches()
+        token_cache.invalidate_user(self.admin.pk)
+        return self.client.get(url, **self.auth, **extra)
+
+    def test_every_budget_is_exercised(self):
+        self.assertEqual({label for label, _, _ in self.requests}, set(settings.QUERY_BUDGETS))
+
+    def test_views_stay_within_budget(self):
+        for label, url, extra in self.requests:
+            with self.subTest(label=label, url=url):
+                self.assertEqual(self.cold_get(url, **extra).status_code, 200)
+
+    def test_over_budget_raises(self):
+        for label, url, extra in self.requests:
+            with self.subTest(label=label, url=url), override_settings(QUERY_BUDGETS={label: 0}):
+                with self.assertRaises(QueryBudgetExceeded):
+                    self.cold_get(url, **extra)
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class TokenUser:
+    """
+    The request user of TokenAuth, built from the user row, from token
+    claims or from a cached snapshot. It exposes only the attributes that
+    permissions and views read and is not a model instance.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, id, email, role, is_active, is_staff, is_superuser):
+        self.id = self.pk = id
+        self.email = email
+        self.role = role
+        self.is_active = is_active
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+
+    def __str__(self):
+        return self.email
+
+    @staticmethod
+    def has_claims(payload):
+        return 'ver' in payload
+
+    @classmethod
+    def from_claims(cls, payload):
+        return cls(id=payload['id'],
+                   email=payload['email'],
+                   role=payload['role'],
+                   is_active=payload['is_active'],
+                   is_staff=payload['is_staff'],
+                   is_superuser=payload['is_superuser'])
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(id=user.pk,
+                   email=user.email,
+                   role=user.role,
+                   is_active=user.is_active,
+                   is_staff=user.is_staff,
+                   is_superuser=user.is_superuser)
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified tokens. An entry lives until the token's `exp`
+    or `ttl` seconds, whichever comes first. The cache is per process, so
+    `ttl` bounds how long another worker may keep serving a user that was
+    deactivated elsewhere.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tokens_by_user = {}
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, payload, user = entry
+            if expires_at <= time.time():
+                self._discard(token)
+                return None
+            self._entries.move_to_end(token)
+            return payload, user
+
+    def set(self, token, payload, user):
+        if self.max_size <= 0:
+            return
+        expires_at = min(payload['exp'], time.time() + self.ttl)
+        with self._lock:
+            self._discard(token)
+            self._entries[token] = (expires_at, payload, user)
+            self._tokens_by_user.setdefault(user.pk, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._discard(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _discard(self, token):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        user_id = entry[2].pk
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
+
+
+def _token_version_key(user_id):
+    return f'my_gym:token_version:{user_id}'
+
+
+def remember_token_version(user_id, version):
+    # Stateless tokens outlive no more than STATELESS_ACCESS_TOKEN_LIFETIME,
+    # so the revocation marker does not need to either.
+    cache.set(_token_version_key(user_id), version,
+              timeout=settings.STATELESS_ACCESS_TOKEN_LIFETIME)
+
+
+def is_token_revoked(payload):
+    version = cache.get(_token_version_key(payload['id']))
+    return version is not None and payload['ver'] < version
+
+
+token_cache = TokenCache(max_size=getattr(settings, 'TOKEN_CACHE_MAX_SIZE', 10000),
+                         ttl=getattr(settings, 'TOKEN_CACHE_TTL', 300))
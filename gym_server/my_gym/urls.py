@@ -1,6 +1,8 @@
+from django.urls import path
+
 from rest_framework.routers import DefaultRouter
 
-from .views import UserViewSet, PositionViewSet, SubscriptionListView, ServiceViewSet
+from .views import UserViewSet, PositionViewSet, SubscriptionListView, ServiceViewSet, MetricsView, SyncView
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
@@ -8,4 +10,7 @@ router.register(r'positions', PositionViewSet, basename='position')
 router.register(r'subscriptions', SubscriptionListView, basename='subscription')
 router.register(r'services', ServiceViewSet, basename='service')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls + [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('sync/', SyncView.as_view(), name='sync'),
+]
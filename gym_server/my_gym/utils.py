@@ -1,25 +1,81 @@
-from datetime import datetime, date
-from dateutil.relativedelta import relativedelta
+from datetime import date
 
 from django.core.validators import validate_email
+from django.db.models.signals import m2m_changed
 
-from .models import UserModel, TokenModel
+from .refresh_tokens import store_refresh_token
 
 
 # authentication app: LoginView
-def write_refresh_token_to_db(user_id, refresh_token):
-    user = UserModel.objects.get(pk=user_id)
-    try:
-        token_model_obj = TokenModel.objects.get(user=user)
-        token_model_obj.refresh_token = refresh_token
-        token_model_obj.save()
-    except TokenModel.DoesNotExist:
-        TokenModel.objects.create(user=user, refresh_token=refresh_token)
-
-
-# my_gym app: ProfileFilter
-def get_expire_date(month):
-    return datetime.now().date() - relativedelta(months=month)
+def write_refresh_token_to_db(user_id, refresh_token, device=''):
+    store_refresh_token(user_id, refresh_token, device)
+
+
+# my_gym app: ClientProfileSerializer, StaffProfileSerializer
+def is_same_value(instance, attr, value):
+    # Foreign keys are compared by id, so the related row is not loaded.
+    field = instance._meta.get_field(attr)
+    return getattr(instance, field.attname) == getattr(value, 'pk', value)
+
+
+def sync_m2m(instance, field_name, objs, created=False):
+    """
+    Make the `field_name` relation of `instance` hold exactly `objs`
+    (instances or pks). Reads the current through rows once, unless the
+    instance was just `created`, then inserts the missing rows with one
+    bulk_create and deletes the extra ones with one DELETE. Sends the same
+    m2m_changed signals as add()/remove(). Returns True if anything changed.
+    """
+    field = instance._meta.get_field(field_name)
+    through = field.remote_field.through
+    source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+    related_model = field.remote_field.model
+    db = instance._state.db
+
+    wanted = list(dict.fromkeys(getattr(obj, 'pk', obj) for obj in objs))
+    if created:
+        current = set()
+    else:
+        current = set(through.objects.using(db)
+                      .filter(**{f'{source}_id': instance.pk})
+                      .values_list(f'{target}_id', flat=True))
+    added = [pk for pk in wanted if pk not in current]
+    removed = current.difference(wanted)
+
+    signal_kwargs = {'sender': through, 'instance': instance, 'reverse': False,
+                     'model': related_model, 'using': db}
+    if removed:
+        m2m_changed.send(action='pre_remove', pk_set=removed, **signal_kwargs)
+        (through.objects.using(db)
+         .filter(**{f'{source}_id': instance.pk, f'{target}_id__in': removed})
+         .delete())
+        m2m_changed.send(action='post_remove', pk_set=removed, **signal_kwargs)
+    if added:
+        m2m_changed.send(action='pre_add', pk_set=set(added), **signal_kwargs)
+        through.objects.using(db).bulk_create([through(**{f'{source}_id': instance.pk, f'{target}_id': pk})
+                                               for pk in added])
+        m2m_changed.send(action='post_add', pk_set=set(added), **signal_kwargs)
+
+    if added or removed:
+        getattr(instance, '_prefetched_objects_cache', {}).pop(field.name, None)
+        return True
+    return False
+
+
+# Keeps `IN (...)` lists under SQLite's bound parameter limit.
+CHUNK_SIZE = 500
+
+
+# my_gym app: onboarding, renewals, search
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def to_model_values(model, data):
+    field_names = {field.name for field in model._meta.concrete_fields}
+    return {attr: model._meta.get_field(attr).to_python(value) if attr in field_names else value
+            for attr, value in data.items()}
 
 
 def check_user_data(user_data):
@@ -0,0 +1,47 @@
+"""
+Versions of client and staff profiles for conditional requests. A profile's
+own saves move its version (VersionedProfileModel); changes to what its
+representation nests, i.e. its user, subscription, services, position or
+clients, move it through touch(), which also logs the change for sync.
+"""
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .changelog import record
+
+
+def touch(queryset):
+    """Start a new version of every profile in `queryset`."""
+    ids = list(queryset.values_list('pk', flat=True))
+    if ids:
+        # A subquery rather than the ids, which can outnumber the bound
+        # parameters a statement may have.
+        (queryset.model.objects.filter(pk__in=queryset.values('pk'))
+         .update(version=F('version') + 1, modified_at=timezone.now()))
+        record(queryset.model, ids)
+    return len(ids)
+
+
+def get_etag(profile):
+    return f'"{profile._meta.model_name}-{profile.pk}-{profile.version}"'
+
+
+def get_last_modified(profile):
+    return int(profile.modified_at.timestamp())
+
+
+def get_headers(profile):
+    return {'ETag': get_etag(profile), 'Last-Modified': http_date(get_last_modified(profile))}
+
+
+def check_preconditions(request, profile):
+    """
+    The status the If-Match, If-None-Match, If-Modified-Since and
+    If-Unmodified-Since headers of `request` call for (304 or 412), or None
+    when the request should go ahead.
+    """
+    response = get_conditional_response(request, etag=get_etag(profile),
+                                        last_modified=get_last_modified(profile))
+    return response.status_code if response is not None else None
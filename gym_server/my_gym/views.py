@@ -1,28 +1,66 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import QuerySet
+from django.db import IntegrityError, transaction
+from django.db.models import Q, QuerySet
 
-from rest_framework import viewsets, mixins, status
+from rest_framework import viewsets, mixins, serializers, status
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.utils.urls import replace_query_param
 
 from .serializers import (
     StaffProfileSerializer, ClientProfileSerializer, PositionModelSerializer,
-    SubscriptionModelSerializer, ServiceModelSerializer
+    SubscriptionModelSerializer, ServiceModelSerializer, SubscriptionRenewalSerializer
+)
+from .mixins import CheckValidParamMixin, CachedListMixin
+from .models import (
+    StaffProfileModel, ClientProfileModel, PositionModel, SubscriptionModel, ServiceModel, StaffClientModel,
+    ChangeLogModel
 )
-from .mixins import CheckValidParamMixin
-from .models import StaffProfileModel, ClientProfileModel, PositionModel, SubscriptionModel, ServiceModel
-from .filters import PositionFilter, SubscriptionFilter, ServiceFilter, ProfileFilter
+from .filters import PositionFilter, SubscriptionFilter, ServiceFilter, ProfileFilter, parse_ids
+from .pagination import KeysetPagination
+from .renderers import NDJSONRenderer, CSVRenderer, PrometheusRenderer
+from .parsers import CSVParser
+from .query_plans import ClientProfileQueryPlan, StaffProfileQueryPlan
+from .representations import ClientProfileRepresentation, StaffProfileRepresentation
 from .errors import RoleURLParamError, ExpireError
-from .permissions import ClientOnly, StaffOnly
+from .permissions import ClientOnly, StaffOnly, MetricsScraper
+from .renewals import renew_subscriptions
+from .onboarding import onboard_members
+from .stats import get_member_stats, get_snapshot
+from .instrumentation import registry
+from .sync import get_changes, StaleCursor
+from . import versions
+from . import generations
 
 
 class UserViewSet(CheckValidParamMixin,
+                  CachedListMixin,
                   viewsets.ModelViewSet):
     permission_classes = (IsAuthenticated,)
     filterset_class = ProfileFilter
+    pagination_class = KeysetPagination
+    # Users are numbered in the order they were created (user.created_at).
+    # user__id compiles to the profile's user_id, so the (user, id) index of
+    # the profile table serves the ordering and the cursor seek.
+    keyset_ordering = ('user__id', 'id')
+    search_keyset_ordering = ('-search_rank', 'id')
     role = None
     client_role = 1
     staff_role = 2
+    export_chunk_size = 500
+    max_trainer_lookup_ids = 500
+    cache_dependencies_by_role = {
+        client_role: (generations.USERS, generations.CLIENT_PROFILES, generations.SUBSCRIPTIONS,
+                      generations.SERVICES),
+        staff_role: (generations.USERS, generations.STAFF_PROFILES, generations.POSITIONS),
+    }
 
     def get_role(self, request):
         try:
@@ -35,7 +73,7 @@ class UserViewSet(CheckValidParamMixin,
         if request.user.role != role \
                 and not request.user.is_superuser \
                 or instance\
-                and request.user.id  != instance.user.id\
+                and request.user.id  != instance.user_id\
                 and not request.user.is_superuser:
             self.permission_denied(
                 request,
@@ -43,11 +81,7 @@ class UserViewSet(CheckValidParamMixin,
             )
 
     def get_object(self):
-        queryset = None
-        if self.role == self.client_role:
-            queryset = self.filter_queryset(ClientProfileModel.objects.all())
-        elif self.role == self.staff_role:
-            queryset = self.filter_queryset(StaffProfileModel.objects.all())
+        queryset = self.get_queryset()
 
         lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
 
@@ -65,49 +99,195 @@ class UserViewSet(CheckValidParamMixin,
 
         return obj
 
-    def get_serializer(self, *args, **kwargs):
+    def get_serializer_class(self):
+        if self.role == self.client_role:
+            return ClientProfileSerializer
+        elif self.role == self.staff_role:
+            return StaffProfileSerializer
+
+    def get_query_plan(self):
+        if self.role == self.client_role:
+            plan_class = ClientProfileQueryPlan
+        elif self.role == self.staff_role:
+            plan_class = StaffProfileQueryPlan
+        return plan_class(action=self.action, params=self.request.query_params)
+
+    def get_representation(self):
         if self.role == self.client_role:
-            serializer_class = ClientProfileSerializer
+            return ClientProfileRepresentation()
         elif self.role == self.staff_role:
-            serializer_class = StaffProfileSerializer
+            return StaffProfileRepresentation()
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
         kwargs.setdefault('context', self.get_serializer_context())
         return serializer_class(*args, **kwargs)
 
-    def get_queryset(self):
+    def get_profile_model(self):
         if self.role == self.client_role:
-            queryset = self.filter_queryset(ClientProfileModel.objects.all())
+            return ClientProfileModel
         elif self.role == self.staff_role:
-            queryset = self.filter_queryset(StaffProfileModel.objects.all())
+            return StaffProfileModel
+
+    def get_queryset(self):
+        queryset = self.filter_queryset(self.get_profile_model().objects.all())
+        queryset = self.get_query_plan().apply(queryset)
         if isinstance(queryset, QuerySet):
             # Ensure queryset is re-evaluated on each request.
             queryset = queryset.all()
         return queryset
 
+    def get_cache_dependencies(self):
+        return self.cache_dependencies_by_role[self.role]
+
+    def get_cache_variant(self, request):
+        # The expired filter compares with today's date.
+        return (datetime.now().date(),)
+
     def list(self, request, *args, **kwargs):
         self.role = self.get_role(request)
         self.check_role_permissions(request, self.staff_role)
+        return self.cached_list(request, lambda: self.list_profiles(request))
 
-        queryset = self.filter_queryset(self.get_queryset())
+    def list_profiles(self, request):
+        if request.query_params.get('search', '').strip():
+            self.keyset_ordering = self.search_keyset_ordering
+
+        representation = self.get_representation()
+        queryset = representation.values(self.get_queryset())
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(representation.from_rows(page)).data
+
+        return representation.from_rows(queryset)
+
+    @action(detail=False, renderer_classes=(NDJSONRenderer, CSVRenderer))
+    def export(self, request, *args, **kwargs):
+        self.role = self.get_role(request)
+        self.check_role_permissions(request, self.staff_role)
+
+        queryset = self.get_queryset()
+        serializer = self.get_serializer()
+        rows = (serializer.to_representation(instance)
+                for instance in self.iterate_in_chunks(queryset))
+
+        renderer = request.accepted_renderer
+        return StreamingHttpResponse(renderer.stream(rows),
+                                     content_type=f'{renderer.media_type}; charset={renderer.charset}')
+
+    def iterate_in_chunks(self, queryset):
+        # Page through the queryset by primary key, so only one chunk of
+        # profiles and its prefetched relations are held in memory at a time.
+        queryset = queryset.order_by('pk')
+        last_pk = None
+        while True:
+            chunk_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            chunk = list(chunk_queryset[:self.export_chunk_size])
+            if not chunk:
+                return
+            yield from chunk
+            last_pk = chunk[-1].pk
+
+    @action(detail=False, methods=['post'], parser_classes=(JSONParser, CSVParser))
+    def bulk(self, request, *args, **kwargs):
+        self.role = self.get_role(request)
+        self.check_role_permissions(request, self.staff_role)
+
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({"errors": {"error": ["Expected a list of members."]}},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > settings.ONBOARDING_MAX_ROWS:
+            return Response({"errors": {"error": [f"At most {settings.ONBOARDING_MAX_ROWS} members per request."]}},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        try:
+            results = onboard_members(rows, self.role)
+        except IntegrityError:
+            return Response({"errors": {"error": ["Members were changed concurrently, retry the request."]}},
+                            status=status.HTTP_409_CONFLICT)
+        return Response({"results": results})
+
+    @action(detail=False)
+    def trainers(self, request, *args, **kwargs):
+        """Staff profiles serving each client: /users/trainers/?role=2&clients=1,2"""
+        self.role = self.get_role(request)
+        self.check_role_permissions(request, self.staff_role)
+
+        clients_id_list = parse_ids(request.query_params.get('clients', ''), 'clients')
+        if len(clients_id_list) > self.max_trainer_lookup_ids:
+            return Response({"errors": {"error": [f"At most {self.max_trainer_lookup_ids} client ids per request."]}},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        trainers = {client_id: [] for client_id in clients_id_list}
+        rows = (StaffClientModel.objects
+                .filter(client_id__in=clients_id_list)
+                .order_by('client_id', 'staff_id')
+                .values_list('client_id', 'staff_id', 'staff__user_id', 'staff__position_id'))
+        for client_id, staff_id, user_id, position_id in rows:
+            trainers[client_id].append({"id": staff_id, "user_id": user_id, "position_id": position_id})
+        return Response({"results": [{"client_id": client_id, "trainers": staff}
+                                     for client_id, staff in trainers.items()]})
+
+    @action(detail=False)
+    def stats(self, request, *args, **kwargs):
+        """
+        Dashboard aggregates: /users/stats/?role=1 takes the client filters,
+        ?role=2 the staff filters. Without filters today's snapshot is served
+        when one exists, unless live=1.
+        """
+        self.role = self.get_role(request)
+        self.check_role_permissions(request, self.staff_role)
+
+        if self.role == self.client_role:
+            clients, staff = self.filter_queryset(ClientProfileModel.objects.all()), None
+        else:
+            clients, staff = None, self.filter_queryset(StaffProfileModel.objects.all())
+        filtered = (clients if staff is None else staff).query.has_filters()
+
+        if not filtered and request.query_params.get('live') != '1':
+            snapshot = get_snapshot()
+            if snapshot is not None:
+                return Response(dict(snapshot.data, snapshot=snapshot.created_at))
+        return Response(dict(get_member_stats(clients, staff), snapshot=None))
+
+    def get_profile_version(self, lock=False):
+        """The profile behind the URL with only what preconditions compare."""
+        queryset = self.filter_queryset(self.get_profile_model().objects.all())
+        if lock:
+            queryset = queryset.select_for_update()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return get_object_or_404(queryset.only('user_id', 'version', 'modified_at'),
+                                 **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+
+    def precondition_response(self, request, profile):
+        status_code = versions.check_preconditions(request, profile)
+        if status_code == status.HTTP_304_NOT_MODIFIED:
+            return Response(status=status_code, headers=versions.get_headers(profile))
+        if status_code == status.HTTP_412_PRECONDITION_FAILED:
+            return Response({"errors": {"error": ["The profile was changed, fetch it again."]}},
+                            status=status_code, headers=versions.get_headers(profile))
 
     def retrieve(self, request, *args, **kwargs):
         self.role = self.get_role(request)
+        if 'If-None-Match' in request.headers or 'If-Modified-Since' in request.headers:
+            # Answer revalidations from the version columns alone.
+            profile = self.get_profile_version()
+            self.check_role_permissions(request, self.role, profile)
+            response = self.precondition_response(request, profile)
+            if response is not None:
+                return response
+
         instance = self.get_object()
-        serializer = self.get_serializer(instance)
 
         self.check_role_permissions(request, self.role, instance)
 
+        data = self.get_representation().from_instance(instance)
+        headers = versions.get_headers(instance)
         if self.role == self.client_role:
             if instance.is_expired:
-                headers = {"error": ExpireError.msg}
-                return Response(serializer.data, headers=headers)
-        return Response(serializer.data)
+                headers["error"] = ExpireError.msg
+        return Response(data, headers=headers)
 
     def create(self, request, *args, **kwargs):
         self.role = self.get_role(request)
@@ -122,18 +302,30 @@ class UserViewSet(CheckValidParamMixin,
     def update(self, request, *args, **kwargs):
         self.role = self.get_role(request)
         partial = kwargs.pop('partial', False)
-        instance = self.get_object()
 
-        self.check_role_permissions(request, self.role, instance)
+        with transaction.atomic():
+            if 'If-Match' in request.headers or 'If-Unmodified-Since' in request.headers:
+                # The row lock keeps a concurrent update from landing
+                # between the comparison and our write.
+                profile = self.get_profile_version(lock=True)
+                self.check_role_permissions(request, self.role, profile)
+                response = self.precondition_response(request, profile)
+                if response is not None:
+                    return response
 
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
+            instance = self.get_object()
+
+            self.check_role_permissions(request, self.role, instance)
+
+            serializer = self.get_serializer(instance, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
 
         if getattr(instance, '_prefetched_objects_cache', None):
             instance._prefetched_objects_cache = {}
 
-        return Response(serializer.data)
+        profile = type(instance).objects.only('version', 'modified_at').get(pk=instance.pk)
+        return Response(serializer.data, headers=versions.get_headers(profile))
 
     def destroy(self, request, *args, **kwargs):
         self.role = self.get_role(request)
@@ -149,24 +341,39 @@ class UserViewSet(CheckValidParamMixin,
         instance.user.is_active = False
         instance.user.save()
         try:
-            instance.subscription.delete()
+            subscription = instance.subscription
         except AttributeError:
-            pass
-        instance.delete()
+            instance.delete()
+        else:
+            # Cascades to the client profile.
+            subscription.delete()
         return instance.user.id
 
 
-class SubscriptionListView(mixins.ListModelMixin,
+class SubscriptionListView(CachedListMixin,
+                           mixins.ListModelMixin,
                            viewsets.GenericViewSet):
+    cache_dependencies = (generations.SUBSCRIPTIONS,)
     permission_classes = ((StaffOnly|IsAdminUser),)
     filterset_class = SubscriptionFilter
     serializer_class = SubscriptionModelSerializer
     queryset = SubscriptionModel.objects.all()
 
+    @action(detail=False, methods=['post'], serializer_class=SubscriptionRenewalSerializer)
+    def renew(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = renew_subscriptions(serializer.validated_data['subscriptions'],
+                                      renewed_at=serializer.validated_data.get('renewed_at'))
+        return Response({"results": results})
 
-class ServiceViewSet(viewsets.ModelViewSet):
+
+class ServiceViewSet(CachedListMixin,
+                     viewsets.ModelViewSet):
+    cache_dependencies = (generations.SERVICES,)
     serializer_class = ServiceModelSerializer
     filterset_class = ServiceFilter
+    pagination_class = KeysetPagination
     queryset = ServiceModel.objects.all()
     permission_classes_by_action = {'list': [ClientOnly|StaffOnly|IsAdminUser],
                                     'retrieve': [ClientOnly|StaffOnly|IsAdminUser],
@@ -179,8 +386,65 @@ class ServiceViewSet(viewsets.ModelViewSet):
             return [permission() for permission in self.permission_classes_by_action['default']]
 
 
-class PositionViewSet(viewsets.ModelViewSet):
+class PositionViewSet(CachedListMixin,
+                      viewsets.ModelViewSet):
+    cache_dependencies = (generations.POSITIONS,)
     permission_classes = ((StaffOnly|IsAdminUser),)
     filterset_class = PositionFilter
+    pagination_class = KeysetPagination
     serializer_class = PositionModelSerializer
     queryset = PositionModel.objects.all()
+
+
+class MetricsView(APIView):
+    """Request metrics of this process in the Prometheus text format."""
+    permission_classes = ((IsAdminUser|MetricsScraper),)
+    renderer_classes = (PrometheusRenderer,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(registry.render())
+
+
+class SyncView(APIView):
+    """
+    Entities changed since a cursor, with tombstones of deleted ones:
+    /api/sync/?since=<cursor>&limit=200. Start without `since` and pass the
+    returned cursor back; 410 means it was compacted away and the client has
+    to sync from scratch.
+    """
+    permission_classes = ((ClientOnly|StaffOnly|IsAdminUser),)
+    limit = 200
+    max_limit = 500
+
+    @staticmethod
+    def get_int(request, name, default):
+        try:
+            value = int(request.query_params.get(name, default))
+        except ValueError:
+            value = -1
+        if value < 0:
+            raise serializers.ValidationError({name: ['Expected a non-negative integer.']})
+        return value
+
+    def get_visible(self, request):
+        user = request.user
+        if user.role == 2 or user.is_staff or user.is_superuser:
+            return None
+        # Clients sync services and their own profile.
+        return (Q(entity=ChangeLogModel.SERVICE)
+                | Q(entity=ChangeLogModel.CLIENT,
+                    object_id__in=ClientProfileModel.objects.filter(user_id=user.pk).values('pk')))
+
+    def get(self, request, *args, **kwargs):
+        since = self.get_int(request, 'since', 0)
+        limit = min(self.get_int(request, 'limit', self.limit) or self.limit, self.max_limit)
+        try:
+            batch = get_changes(since, limit, self.get_visible(request))
+        except StaleCursor:
+            return Response({"errors": {"since": ["The cursor is older than the change log, sync again without it."]}},
+                            status=status.HTTP_410_GONE)
+
+        next_link = None
+        if batch['has_more']:
+            next_link = replace_query_param(request.build_absolute_uri(), 'since', batch['cursor'])
+        return Response(dict(batch, next=next_link))